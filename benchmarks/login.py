@@ -0,0 +1,100 @@
+import time
+from passlib.context import CryptContext
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from session import SessionManager
+from session.client import DataClient
+from session.async_client import AsyncDataClient
+from session.client_pool import ClientPool
+from configs.settings import settings
+
+# Login latency with the clients built at every login, as before ClientPool, and lent
+# by a pre-warmed pool; the construction of the clients and the password check are
+# timed on their own. Run it against a scratch database: it creates and deletes
+# the users user-benchmark0, user-benchmark1, ...
+
+def timed(function, count, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(count):
+            function(i)
+        elapsed = (time.perf_counter() - start)/count
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark(users_count=20, rounds=12, repeat=3):
+    session = SessionManager()
+    session.start()
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    hashed = pwd_context.hash('benchmark')
+    names = [f'user-benchmark{i}' for i in range(users_count)]
+    for name in names:
+        session.system_data_client.new(name=name, module='users')
+        session.system_data_client.delete(f'{name}:password')
+        session.system_data_client.set(f'{name}:password:{hashed}')
+
+    def storm(pool):
+        best = None
+        for _ in range(repeat):
+            session.clients = pool
+            pool.warm()
+            seconds = timed(lambda i: session.login(names[i], 'benchmark'), users_count)
+            for name in names:
+                pool.release(session.login_data.pop(name, None), session.async_login_data.pop(name, None))
+            best = seconds if best is None else min(best, seconds)
+        return best
+
+    pool = ClientPool(size=users_count, low_water=0)
+    pool.warm()
+    rows = {
+        'new clients': timed(lambda i: (DataClient(owner=names[i]), AsyncDataClient(owner=names[i])), users_count, repeat),
+        'pooled clients': timed(lambda i: pool.release(*pool.acquire(names[i])), users_count, repeat),
+        'password check': timed(lambda i: pwd_context.verify('benchmark', hashed), users_count, repeat),
+        'login, no pool': storm(ClientPool(size=0, low_water=0)),
+        'login, warm pool': storm(ClientPool(size=users_count, low_water=0)),
+    }
+    print(f'{users_count} logins of distinct users, bcrypt with {rounds} rounds, mean per login, best of {repeat}')
+    for label, seconds in rows.items():
+        print(f'    {label:16s}: {1000*seconds:8.2f} ms')
+
+    for name in names:
+        session.system_data_client.delete(f'{name}:*')
+    session.stop()
+
+if __name__ == "__main__":
+    app_name = sys.argv.pop(0)
+    users_count = 20
+    rounds = 12
+    repeat = 3
+
+    while sys.argv:
+        command = sys.argv.pop(0)
+        if command == '-help':
+            print(\
+    f"""
+    Login latency with and without the pool of pre-warmed clients.
+    Usage:
+        {app_name} <flags>
+
+    The following flags and parameters are allowed:
+    '-n' : number of users logging in; default is {users_count}
+    '-rounds' : bcrypt rounds of their password hashes; default is {rounds}, the one of the logins
+    '-repeat' : number of runs, the best one is reported; default is {repeat}
+    The database is taken from REDIS_URL ({settings.REDIS_URL}).
+    """)
+            sys.exit(0)
+        if command == '-n':
+            users_count = int(sys.argv.pop(0))
+            continue
+        if command == '-rounds':
+            rounds = int(sys.argv.pop(0))
+            continue
+        if command == '-repeat':
+            repeat = int(sys.argv.pop(0))
+            continue
+
+    benchmark(users_count, rounds, repeat)
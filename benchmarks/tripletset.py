@@ -0,0 +1,98 @@
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.triplets import Triplet, TripletSet
+
+# Microbenchmarks of the construction and the union of triplet sets: the slotted
+# tuple-backed Triplet against the former list-backed one.
+# No database is needed.
+
+class FormerTriplet:
+    """The Triplet before __slots__: a list parsed on every construction, hashed by joining."""
+    def __init__(self, *args):
+        self.data = ['*' ,'*' ,'*']
+        for arg in args[::-1]:
+            self.data = [x.strip() for x in str(arg).split(':')] + self.data
+        self.data = self.data[:3]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __eq__(self, other):
+        return self.data == other.data
+
+    def __hash__(self):
+        return hash(':'.join(self.data))
+
+    def __repr__(self):
+        return ':'.join(self.data)
+
+class FormerTripletSet:
+    """The TripletSet before the fast paths: every element is wrapped again."""
+    def __init__(self, data=None):
+        self._items = {}
+        if data is not None:
+            self._items.update(dict.fromkeys([FormerTriplet(x) for x in data]))
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __or__(self, other):
+        return FormerTripletSet(self._items | other._items)
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark(triplets_count=100000, repeat=5):
+    strings = [f'name{i % 1000}:property{i % 7}:value{i}' for i in range(triplets_count)]
+    fields = [tuple(s.split(':')) for s in strings]
+    others = [f'name{i % 1000}:property{i % 7}:value{i + triplets_count//2}' for i in range(triplets_count)]
+    print(f'{triplets_count} triplets, best of {repeat}')
+    for label, triplet_class, set_class in [
+            ('former', FormerTriplet, FormerTripletSet),
+            ('slotted', Triplet, TripletSet)]:
+        a, b = set_class(strings), set_class(others)
+        rows = {
+            'from strings': timed(lambda: set_class(strings), repeat),
+            'from fields': timed(lambda: set_class([triplet_class(*f) for f in fields]), repeat),
+            'copy': timed(lambda: set_class(a), repeat),
+            'union': timed(lambda: a | b, repeat),
+        }
+        print(f'    {label:9s}: ' + ', '.join(f'{name} {1000*seconds:8.1f} ms' for name, seconds in rows.items()))
+
+if __name__ == "__main__":
+    app_name = sys.argv.pop(0)
+    triplets_count = 100000
+    repeat = 5
+
+    while sys.argv:
+        command = sys.argv.pop(0)
+        if command == '-help':
+            print(\
+    f"""
+    Construction and union times of the triplet sets.
+    Usage:
+        {app_name} <flags>
+
+    The following flags and parameters are allowed:
+    '-n' : number of triplets; default is {triplets_count}
+    '-repeat' : number of runs, the best one is reported; default is {repeat}
+    """)
+            sys.exit(0)
+        if command == '-n':
+            triplets_count = int(sys.argv.pop(0))
+            continue
+        if command == '-repeat':
+            repeat = int(sys.argv.pop(0))
+            continue
+
+    benchmark(triplets_count, repeat)
@@ -0,0 +1,115 @@
+import time
+import secrets
+import redis
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from session.connector import DatabaseConnector
+from configs.settings import settings
+
+# Compares the write throughput of the scripted connector primitives with the
+# former path: EXISTS + GET + split + insert + SET of a comma-joined string.
+# The scripted writes go to the undo log of a throwaway owner; the keys, their index
+# entries and that undo log are deleted at the end, even if the run is interrupted.
+
+class RoundTripWriter:
+    """The write path of DatabaseConnector before the Lua scripts."""
+    def __init__(self, client:redis.Redis):
+        self.client = client
+
+    def get(self, key) ->list:
+        res = self.client.get(key)
+        if res is None:
+            return []
+        return res.split(',')
+
+    def set(self, key, value, position=None, unique=True):
+        if self.client.exists(key):
+            entry = self.get(key)
+            if unique and value in entry:
+                return 0
+            if position is None:
+                position = len(entry)
+            entry.insert(position, str(value))
+        else:
+            entry = [value]
+        return self.client.set(key, ",".join(entry))
+
+    def delete(self, key, value):
+        entry = self.get(key)
+        if value not in entry:
+            return 0
+        entry.remove(value)
+        if entry:
+            self.client.set(key, ",".join(entry))
+        else:
+            self.client.delete(key)
+        return 1
+
+def run(writer, key, values, keys_count):
+    t0 = time.perf_counter()
+    for i, value in enumerate(values):
+        writer.set(f'{key}:{i % keys_count}', value)
+    t1 = time.perf_counter()
+    for i, value in enumerate(values):
+        writer.delete(f'{key}:{i % keys_count}', value)
+    t2 = time.perf_counter()
+    return len(values)/(t1-t0), len(values)/(t2-t1)
+
+def cleanup(connector, prefixes):
+    """Deletes what the benchmark wrote: the keys of the prefixes, their value index entries and the undo log of the connector."""
+    client = connector.client
+    for prefix in prefixes:
+        for key in client.scan_iter(match=f'{prefix}:*'):
+            if client.type(key) == 'list':
+                for value in client.lrange(key, 0, -1):
+                    client.srem(f'{settings.VALUE_INDEX_PREFIX}{value}', key)
+            client.delete(key)
+    for groups_key in connector.undo_log.keys:
+        client.delete(groups_key, *client.scan_iter(match=f'{groups_key}:*'))
+
+def benchmark(values_count=5000, keys_count=1):
+    connector = DatabaseConnector(owner=f'benchmark-{secrets.token_hex(4)}')
+    connector.load_scripts()
+    values = [f'value{i}' for i in range(values_count)]
+    writers = [('round trips', RoundTripWriter(connector.client), 'benchmark-string'),
+               ('lua scripts', connector, 'benchmark-list')]
+    print(f'{values_count} writes over {keys_count} keys ({values_count//keys_count} values per key)')
+    try:
+        for label, writer, key in writers:
+            set_rate, delete_rate = run(writer, key, values, keys_count)
+            print(f'    {label:12s}: set {set_rate:10.0f} ops/s, delete {delete_rate:10.0f} ops/s')
+    finally:
+        cleanup(connector, [key for _, _, key in writers])
+
+if __name__ == "__main__":
+    app_name = sys.argv.pop(0)
+    values_count = 5000
+    keys_count = 1
+
+    while sys.argv:
+        command = sys.argv.pop(0)
+        if command == '-help':
+            print(\
+    f"""
+    Write throughput of the scripted DatabaseConnector primitives
+    against the former round-trip path.
+    Usage:
+        {app_name} <flags>
+
+    The following flags and parameters are allowed:
+    '-n' : number of written values; default is {values_count}
+    '-keys' : number of keys the values are spread over; default is {keys_count}
+    The database is taken from REDIS_URL ({settings.REDIS_URL}).
+    """)
+            sys.exit(0)
+        if command == '-n':
+            values_count = int(sys.argv.pop(0))
+            continue
+        if command == '-keys':
+            keys_count = int(sys.argv.pop(0))
+            continue
+
+    benchmark(values_count, keys_count)
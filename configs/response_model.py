@@ -18,4 +18,10 @@ class APIResponse(BaseModel):
     timestamp: float = Field(default_factory=lambda: datetime.now().timestamp())
     message: str = ""
     success: bool = False
-    output: dict|list|None = None
\ No newline at end of file
+    output: dict|list|None = None
+
+class BatchResponse(BaseModel):
+    timestamp: float = Field(default_factory=lambda: datetime.now().timestamp())
+    message: str = ""
+    success: bool = False
+    results: list[APIResponse] = Field(default_factory=list)
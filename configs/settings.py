@@ -1,11 +1,32 @@
 import os
+import threading
+import redis
+import redis.asyncio
 
 class Settings:
     def __init__(self):
         self.REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        # the process-wide connection pool, see connection_pool
+        self.REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))    # seconds to wait for a free connection
+        self.REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+        self.REDIS_SOCKET_KEEPALIVE = os.getenv("REDIS_SOCKET_KEEPALIVE", "1") == "1"
         self.EXPORT_DIR = os.environ.get("EXPORT_DIR", "/exports")
         self.INSTANCE_ID = f"{os.getenv('HOSTNAME','triosdb')}-{os.getpid()}"
-        self.LOCK_KEY   = "triosdb:lock"
+        self.INTERNAL_PREFIX = "triosdb:"   # keys of the server itself, not data
+        self.LOCK_KEY   = f"{self.INTERNAL_PREFIX}lock"
+        self.NAME_REGISTRY_KEY = f"{self.INTERNAL_PREFIX}names"
+        self.UNDO_LOG_PREFIX = f"{self.INTERNAL_PREFIX}undo:"     # + user name, see session/undo_log.py
+        self.VALUE_INDEX_PREFIX = f"{self.INTERNAL_PREFIX}value:" # + value -> set of name:property keys
+        self.PROPERTY_INDEX_PREFIX = f"{self.INTERNAL_PREFIX}property:" # + property -> set of names
+        self.SESSION_PREFIX = f"{self.INTERNAL_PREFIX}session:"   # + user name, expires with the session
+        # hash of versions bumped by the changes of the _belongs_to lists (field: the module) and
+        # of the read and write lists (field: the user); field '*' is reset by flushes and
+        # reindexing (see session/permissions.py)
+        self.MEMBERSHIP_VERSIONS_KEY = f"{self.INTERNAL_PREFIX}membership_versions"
+        # bumped whenever the layout of the indices changes: SessionManager then rebuilds them
+        self.INDEX_VERSION_KEY = f"{self.INTERNAL_PREFIX}index_version"
+        self.INDEX_VERSION = 2
         self.LOCK_TTL_MS = 10000
         self.RENEW_EVERY = 3
 
@@ -13,6 +34,70 @@ class Settings:
         self.S3_BUCKET = os.getenv("S3_BUCKET", "")
         self.S3_PREFIX = os.getenv("S3_PREFIX", "exports/")
 
-        self.undo_list_length = 1000
+        self.undo_list_length = 100     # maximal number of commands (undo groups) in the undo log of a user
+        # number of commands sent in one pipeline by the batched reads
+        self.PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "1000"))
+        # number of names read per chunk by the streaming get of /execute/stream
+        self.STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+        # in-process read cache of the connectors, 0 entries disables it
+        self.READ_CACHE_ENTRIES = int(os.getenv("READ_CACHE_ENTRIES", "0"))
+        self.READ_CACHE_MAX_SIZE = int(os.getenv("READ_CACHE_MAX_SIZE", "50000000"))   # characters
+        self.READ_CACHE_CHANNEL = f"{self.INTERNAL_PREFIX}invalidate"
+        # in-process memo of the _alias/_member expansion of DataClient.get, 0 entries disables it
+        self.EXPANSION_CACHE_ENTRIES = int(os.getenv("EXPANSION_CACHE_ENTRIES", "10000"))
+        # in-process memberships and friendships of DataClient.are_friends, 0 entries disables it
+        self.FRIEND_GRAPH_ENTRIES = int(os.getenv("FRIEND_GRAPH_ENTRIES", "100000"))
+        # seconds a validated token is trusted by the in-process session table, see session/session_table.py
+        self.SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "5"))
+        # the sliding expiry of a session is pushed forward at most every SESSION_REFRESH_INTERVAL seconds
+        self.SESSION_REFRESH_INTERVAL = float(os.getenv("SESSION_REFRESH_INTERVAL", "60"))
+        # sibling sub-commands run in parallel: at most SUBCOMMAND_CONCURRENCY at once per command,
+        # on a pool of SUBCOMMAND_THREADS threads shared by the sync commands of the process
+        self.SUBCOMMAND_CONCURRENCY = int(os.getenv("SUBCOMMAND_CONCURRENCY", "4"))
+        self.SUBCOMMAND_THREADS = int(os.getenv("SUBCOMMAND_THREADS", "16"))
+        # most commands accepted by one request of the batch endpoint
+        self.BATCH_MAX_COMMANDS = int(os.getenv("BATCH_MAX_COMMANDS", "1000"))
+        # idle DataClients built in advance for the logins, see session/client_pool.py
+        self.CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "16"))
+        # the pool is refilled in the background when fewer clients are idle; 0 never refills it
+        self.CLIENT_POOL_LOW_WATER = int(os.getenv("CLIENT_POOL_LOW_WATER", "8"))
+
+        self._connection_pool = None
+        self._async_connection_pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def connection_pool(self) -> redis.ConnectionPool:
+        """
+            The connection pool shared by every DatabaseConnector of the process.
+            It is created on first use; when all REDIS_MAX_CONNECTIONS connections are busy,
+            a caller waits up to REDIS_POOL_TIMEOUT seconds for one to be released.
+        """
+        with self._pool_lock:
+            if self._connection_pool is None:
+                self._connection_pool = redis.BlockingConnectionPool.from_url(
+                    self.REDIS_URL,
+                    decode_responses=True,
+                    max_connections=self.REDIS_MAX_CONNECTIONS,
+                    timeout=self.REDIS_POOL_TIMEOUT,
+                    health_check_interval=self.REDIS_HEALTH_CHECK_INTERVAL,
+                    socket_keepalive=self.REDIS_SOCKET_KEEPALIVE,
+                )
+            return self._connection_pool
+
+    @property
+    def async_connection_pool(self) -> redis.asyncio.ConnectionPool:
+        """The redis.asyncio counterpart of connection_pool, with the same limits."""
+        with self._pool_lock:
+            if self._async_connection_pool is None:
+                self._async_connection_pool = redis.asyncio.BlockingConnectionPool.from_url(
+                    self.REDIS_URL,
+                    decode_responses=True,
+                    max_connections=self.REDIS_MAX_CONNECTIONS,
+                    timeout=self.REDIS_POOL_TIMEOUT,
+                    health_check_interval=self.REDIS_HEALTH_CHECK_INTERVAL,
+                    socket_keepalive=self.REDIS_SOCKET_KEEPALIVE,
+                )
+            return self._async_connection_pool
 
 settings = Settings()
@@ -1,12 +1,18 @@
+import json
+import time
+import asyncio
+from contextlib import aclosing
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 
 from dependencies import get_session
 from session import SessionManager
-from configs.response_model import APIResponse
+from configs.response_model import APIResponse, BatchResponse, CommandResponse
+from configs.settings import settings
 from datetime import datetime
-from pydantic import BaseModel
-from utils.triplets import TripletSet
+from pydantic import BaseModel, Field
+from utils.triplets import Triplet, TripletSet
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
@@ -14,14 +20,20 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 class CommandRequest(BaseModel):
     command: str
 
+class BatchRequest(BaseModel):
+    commands: list[str] = Field(max_length=settings.BATCH_MAX_COMMANDS)
+    atomic: bool = False
+
 @router.post("/execute", response_model=APIResponse)
 async def execute_command(
     request: CommandRequest,
     token: str = Depends(oauth2_scheme),
     session: SessionManager = Depends(get_session)):
 
-    cmd_response = session.command(request.command, token=token)
+    cmd_response = await session.acommand(request.command, token=token)
+    return api_response(cmd_response)
 
+def api_response(cmd_response: CommandResponse) -> APIResponse:
     if cmd_response.output is None:
         return APIResponse(
             command=cmd_response.command,
@@ -45,4 +57,49 @@ async def execute_command(
             message=cmd_response.message,
             success=cmd_response.success,
             output= cmd_response.output.show()
-        )
\ No newline at end of file
+        )
+
+@router.post("/execute/batch", response_model=BatchResponse)
+async def execute_batch(
+    request: BatchRequest,
+    token: str = Depends(oauth2_scheme),
+    session: SessionManager = Depends(get_session)):
+    """
+        Executes a list of commands with one authentication; the results are in the order of the commands.
+        Consecutive sets are written in shared pipelines, consecutive reads run in parallel.
+        With atomic, the first failed command stops the batch and the writes before it are undone.
+    """
+    t0 = time.time()
+    cmd_responses = await asyncio.to_thread(session.batch, request.commands, token, request.atomic)
+    succeeded = sum(1 for cmd_response in cmd_responses if cmd_response.success)
+    dt = time.time() - t0
+    return BatchResponse(
+        message=f'{succeeded} of {len(cmd_responses)} commands succeeded -- elapsed time: {dt:.2f} seconds',
+        success=succeeded == len(cmd_responses),
+        results=[api_response(cmd_response) for cmd_response in cmd_responses]
+    )
+
+@router.post("/execute/stream")
+async def execute_command_stream(
+    request: CommandRequest,
+    token: str = Depends(oauth2_scheme),
+    session: SessionManager = Depends(get_session)):
+    """
+        Executes the command and streams its output as newline-delimited JSON (application/x-ndjson):
+        a first line {"command", "timestamp"}, one line per entry of the output, a triplet
+        as ["name", "property", "value"], and a last line {"message", "success", "count"}.
+        A get reads the storage chunk by chunk, so that memory stays flat on large results.
+    """
+    cmd_response, chunks = await session.astream(request.command, token=token)
+
+    async def lines():
+        yield json.dumps({'command': cmd_response.command, 'timestamp': cmd_response.timestamp}) + '\n'
+        count = 0
+        # a disconnect closes the chunks in this task, which releases the clients of the command
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                count += len(chunk)
+                yield ''.join(json.dumps(list(x) if isinstance(x, Triplet) else x) + '\n' for x in chunk)
+        yield json.dumps({'message': cmd_response.message, 'success': cmd_response.success, 'count': count}) + '\n'
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
@@ -4,6 +4,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
 from dependencies import get_session
 from session import SessionManager
 
@@ -14,7 +15,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: SessionManager = Depends(get_session)):
-    login = session.login(form_data.username, form_data.password)
+    # password hashing and the sync client would block the event loop
+    login = await run_in_threadpool(session.login, form_data.username, form_data.password)
     if login is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return login
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Form
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
 from dependencies import get_session
 from session import SessionManager
 from utils.file_to_data_hierarchical import list_to_data_hierarchical
@@ -7,10 +8,26 @@ from configs.response_model import APIResponse
 import pandas as pd
 import io
 import json
+from contextlib import closing
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+def table_to_data(data_client, module, df):
+    headers = df.columns.tolist()
+    data = df.values.tolist()
+    names = []
+    triplets = []
+    for d in data:
+        name = d.pop(0)
+        row = [f'{name}:{headers[i+1]}:{v}' for i,v in enumerate(d) if not pd.isna(v)]
+        if row:
+            names.append(name)
+            triplets += row
+    with data_client.server.command_group(f'upload into module {module}'):
+        data_client.new_many(names, module)
+        data_client.set_many(triplets)
+
 @router.post("/upload")
 async def upload_command(
     file: UploadFile = File(...),
@@ -18,19 +35,22 @@ async def upload_command(
     token: str = Depends(oauth2_scheme),
     session: SessionManager = Depends(get_session)):
 
-    try:
-        user = session.get_user_by_token(token)
-        data_client = session.login_data[user]
-    except:
+    user = await session.aget_user_by_token(token)
+    lease = None if user is None else session.lease_clients(user)
+    if lease is None:
         return APIResponse(
             command= f'upload into module {module}',
             message= "invalid token",
         )
-    permitted = data_client.simple_get([user],['write'],['*']).format('value')
+    # the clients stay with the user until the upload ends, even through a logout
+    with closing(lease):
+        return await upload_with_clients(file, module, token, session, user, lease.data_client, lease.async_data_client)
+
+async def upload_with_clients(file, module, token, session, user, data_client, async_data_client):
+    permitted = await async_data_client.permissions(user, 'write')
     if '_all' not in permitted and module not in permitted:
         return APIResponse(
             command= f'upload into module {module}',
-            timestamp=cmd_response.timestamp,
             message= f'You are not allowed to load into module "{module}"',
             success=False,
             output= None
@@ -52,26 +72,19 @@ async def upload_command(
         elif filename.endswith(".txt"):
             lines = contents.decode("utf-8").splitlines()
             # Example: parse lines into a DataFrame
-            list_to_data_hierarchical(data_client, module, lines)
+            await run_in_threadpool(list_to_data_hierarchical, data_client, module, lines)
         elif filename.endswith(".json"):
             data = json.loads(contents.decode("utf-8"))
-            data_client.load_from_json(data, module)
+            await run_in_threadpool(data_client.load_from_json, data, module)
         else:
             raise HTTPException(status_code=400, detail="Unsupported file type")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
 
     if filetype == "table":
-        headers = df.columns.tolist()
-        data = df.values.tolist()
-        for d in data:
-            name = d.pop(0)
-            for i,v in enumerate(d):
-                if not pd.isna(v):
-                    data_client.new(name, module)
-                    data_client.set(f'{name}:{headers[i+1]}:{v}')
+        await run_in_threadpool(table_to_data, data_client, module, df)
 
-    cmd_response = session.command(module, token=token)
+    cmd_response = await session.acommand(module, token=token)
     return APIResponse(
         command=cmd_response.command,
         timestamp=cmd_response.timestamp,
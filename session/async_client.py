@@ -0,0 +1,205 @@
+from session.async_connector import AsyncDatabaseConnector
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.utilities import *
+from utils.triplets import *
+from session.permissions import Permissions
+from session.steps import arun, method_caller
+from session import client_logic
+from configs.settings import settings
+
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+class AsyncDataClient:
+    """
+        The awaitable variant of DataClient for the command path of the API.
+        It covers the storage commands (new, get, set, delete) and their bulk variants; the expression
+        evaluation (filter, yield) and archiving stay on the sync DataClient. The logic is shared with
+        DataClient in session/client_logic.py: this class only awaits its I/O.
+        - *owner*: the user whose undo log registers the writes
+    """
+    def __init__(self, owner='system'):
+        self.server = AsyncDatabaseConnector(owner)
+        self._call = method_caller(self.server)
+
+    def reset(self, owner='system'):
+        """Hands the client over to owner, see ClientPool."""
+        self.server.reset(owner)
+
+    async def _run(self, steps):
+        """Runs steps of session/client_logic.py on the connector."""
+        return await arun(steps, self._call)
+
+    async def exists(self, name):
+        return await self.server.exists(name)
+
+    async def new(self, name, module, permitted = ['_all']):
+        """
+            Creates a new name in the given module, see DataClient.new.
+            Returns: number of added nodes
+        """
+        return await self._run(client_logic.new(self.server, name, module, permitted, 'AsyncDataClient'))
+
+    async def permissions(self, user, mode='read') ->Permissions:
+        """
+            The modules user may read or write (mode), with the names belonging to them;
+            cached per process until a write bumps the version of the user or of one of its modules,
+            and read once per command tree (see session/command_plan.py).
+        """
+        return await self._run(client_logic.permissions(user, mode))
+
+    async def new_many(self, names, module, permitted = ['_all']) -> int:
+        """
+            Bulk variant of new in a single undo group, see DataClient.new_many.
+            Returns: number of added nodes
+        """
+        return await self._run(client_logic.new_many(self.server, names, module, permitted, 'AsyncDataClient'))
+
+    async def is_module(self, name:str):
+        return '_member' in await self.server.get(name)
+
+    async def in_module(self, name, module):
+        return module in await self.server.get(f'{name}:_belongs_to')
+
+    async def in_modules(self, name, modules):
+        return await self._run(client_logic.in_modules(name, modules))
+
+    async def permitted_names(self, names, modules) ->list:
+        """
+            The names belonging to any of the modules: filtered in memory for Permissions,
+            with one pipelined read of their _belongs_to lists otherwise.
+        """
+        return await self._run(client_logic.permitted_names(names, modules))
+
+    async def members(self, module:str):
+        return await self.server.get(f'{module}:_member')
+
+    async def are_friends(self, target_name, name):
+        """
+            Checks if any of the modules of name is a friend of target_name, see DataClient.are_friends.
+            Returns: True if they are friends, False otherwise
+        """
+        return await self._run(client_logic.are_friends(target_name, name))
+
+    async def get(self, triplet, recursion_level=0, permitted = ['_all'], plan=None) ->TripletSet:
+        """
+            Basic getter, see DataClient.get.
+            Returns: set of valid triplets
+        """
+        return await self._run(client_logic.get(self.server, triplet, recursion_level, permitted, plan))
+
+    async def iter_get(self, triplet, recursion_level=0, permitted = ['_all'], batch_size=None):
+        """
+            Streaming variant of get without recursion, for large results: yields the triplets
+            in TripletSets, one per batch of about batch_size (settings.STREAM_BATCH_SIZE) names or keys.
+            Over all the names ('*'), the holders of the explicit values or properties are scanned
+            from the inverted indices, every registered name otherwise; explicit names are expanded as in get.
+            Only the batch and the names already scanned are held in memory.
+            A recursive get needs its whole result: it is yielded at once.
+        """
+        if recursion_level != 0:
+            result = await self.get(triplet, recursion_level=recursion_level, permitted=permitted)
+            if result:
+                yield result
+            return
+        name_set, property_list, value_list = client_logic.parse(triplet)
+        batch_size = batch_size or settings.STREAM_BATCH_SIZE
+        restricted = '_all' not in permitted
+
+        if '*' in name_set and '*' not in value_list:
+            for v in value_list:
+                # a key may occur in several batches of the scan
+                seen = set()
+                async for holders in self.server.scan_set(f'{settings.VALUE_INDEX_PREFIX}{v}', batch_size):
+                    pairs = [key.split(':', 1) for key in holders if key not in seen]
+                    seen.update(holders)
+                    pairs = [(n,p) for n,p in pairs if '*' in property_list or p in property_list]
+                    if restricted:
+                        names = set(await self.permitted_names({n for n,_ in pairs}, permitted))
+                        pairs = [(n,p) for n,p in pairs if n in names]
+                    if pairs:
+                        yield TripletSet([Triplet(n,p,v) for n,p in pairs])
+            return
+
+        # as in get: a _header property of explicit names stops their expansion
+        expanded = '*' in name_set or '_header' not in property_list
+        if not expanded:
+            property_list.pop('_header')
+            if len(property_list)==0:
+                property_list='*'
+
+        async def name_batches():
+            if '*' not in name_set:
+                names = list(name_set)
+                if expanded:
+                    names += [n for n in await self.expand(name_set) if n not in name_set]
+                for start in range(0, len(names), batch_size):
+                    yield names[start:start+batch_size]
+                return
+            seen = set()
+            keys = [settings.NAME_REGISTRY_KEY] if '*' in property_list \
+                else [f'{settings.PROPERTY_INDEX_PREFIX}{p}' for p in property_list]
+            for key in keys:
+                async for names in self.server.scan_set(key, batch_size):
+                    names = [n for n in names if n not in seen]
+                    seen.update(names)
+                    yield names
+
+        async for names in name_batches():
+            if restricted:
+                names = await self.permitted_names(names, permitted)
+            if names:
+                result = await self.simple_get(names, property_list, value_list)
+                if result:
+                    yield result
+
+    async def expand(self, name_set) ->set:
+        """
+            The values of the _alias and _member lists reachable from the names,
+            memoized per name in the expansion cache of the connector.
+        """
+        return await self._run(client_logic.expand(self.server, name_set))
+
+    async def indexed_get(self, property_list, value_list) ->TripletSet:
+        """
+            Getter over all the names for explicit values, read from the inverted value index.
+        """
+        return await self._run(client_logic.indexed_get(property_list, value_list))
+
+    async def simple_get(self, name_set, property_list, value_list) ->TripletSet:
+        """
+            Non-recursive getter over explicit names, in two pipelined phases, see DataClient.simple_get.
+        """
+        return await self._run(client_logic.simple_get(name_set, property_list, value_list))
+
+    async def set(self, triplet, permitted = ['_all']) -> int:
+        """
+            Basic setter, it adds to the elements of the triplet, see DataClient.set.
+            Returns: number of added nodes
+        """
+        return (await self.set_groups([[triplet]], permitted, 'client set'))[0]
+
+    async def set_many(self, triplets, permitted = ['_all']) -> int:
+        """
+            Bulk setter in a single undo group, see DataClient.set_many.
+            Returns: number of added nodes
+        """
+        return (await self.set_groups([triplets], permitted))[0]
+
+    async def set_groups(self, groups, permitted = ['_all'], message='client set_many') -> list:
+        """
+            set_many of several groups of triplets at once, see DataClient.set_groups.
+            Returns: number of added nodes of every group
+        """
+        return await self._run(client_logic.set_groups(self.server, groups, permitted, 'AsyncDataClient', message))
+
+    async def delete(self, triplet, permitted = ['_all']) -> int:
+        """
+            Basic delete, see DataClient.delete.
+            Returns: number of deleted nodes
+        """
+        return await self._run(client_logic.delete(self.server, triplet, permitted))
@@ -0,0 +1,180 @@
+import redis.asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.utilities import *
+from session.scripts import SCRIPTS
+from session.steps import arun
+from session import connector_logic
+from session.read_cache import shared_read_cache, shared_expansion_cache, shared_friend_graph
+from session.undo_log import UndoLog
+from session.command_plan import count_reads
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+from configs.settings import settings
+
+class AsyncDatabaseConnector:
+    """
+        The awaitable variant of DatabaseConnector, on redis.asyncio.
+        Same storage layout, Lua write scripts and undo log; undo and redo stay on the sync connector.
+        The logic is shared with DatabaseConnector (session/connector_logic.py): only the I/O is awaited here.
+        - *owner*: the user whose undo log registers the writes
+    """
+    def __init__(self, owner='system'):
+        self.client = redis.asyncio.Redis(connection_pool=settings.async_connection_pool)
+        self.undo_log = UndoLog(owner)
+        self.scripts = { name:self.client.register_script(source) for name, source in SCRIPTS.items() }
+        self.cache = shared_read_cache()
+        self.expansion_cache = shared_expansion_cache()
+        self.friend_graph = shared_friend_graph()
+
+    def reset(self, owner='system'):
+        """Hands the connector over to owner: its writes go to the undo log of owner."""
+        self.undo_log = UndoLog(owner)
+
+    async def _call(self, method, *args):
+        """The I/O of the steps of session/connector_logic.py."""
+        if method == 'script':
+            name, keys, script_args = args
+            return await self.scripts[name](keys=keys, args=script_args)
+        if method == 'pipeline':
+            commands, transaction = args
+            async with self.client.pipeline(transaction=transaction) as pipe:
+                for command, *arguments in commands:
+                    if command == 'script':
+                        name, keys, script_args = arguments
+                        await self.scripts[name](keys=keys, args=script_args, client=pipe)
+                    else:
+                        getattr(pipe, command)(*arguments)
+                return await pipe.execute()
+        return await getattr(self.client, method)(*args)
+
+    async def _run(self, steps):
+        return await arun(steps, self._call)
+
+    async def get(self, key) ->list:
+        return await self._run(connector_logic.get(self, key))
+
+    async def get_many(self, keys, batch_size=None) ->list:
+        """Value lists of all the keys, pipelined in batches of settings.PIPELINE_BATCH_SIZE."""
+        return await self._run(connector_logic.get_many(self, keys, batch_size))
+
+    def script_keys(self, key) ->list:
+        return [key, settings.NAME_REGISTRY_KEY, *self.undo_log.keys]
+
+    def script_args(self, register=True) ->list:
+        return [settings.READ_CACHE_CHANNEL, *self.undo_log.script_args(register)]
+
+    async def set(self, key, value, position=None, unique=True, register=True):
+        return await self._run(connector_logic.append(self, key, value, position, unique, register))
+
+    async def set_many(self, items, register=True) ->list:
+        """
+            Unique appends of all the (key, value) items, in the given order, sent in
+            MULTI/EXEC pipelines of settings.PIPELINE_BATCH_SIZE writes.
+            Returns: list of positions, -1 for the values already present
+        """
+        return await self._run(connector_logic.set_many(self, items, register))
+
+    async def delete(self, key, value=None, register=True):
+        return await self._run(connector_logic.delete(self, key, value, register))
+
+    def invalidate(self, key=None):
+        """Evicts key, everything if key is None, from the in-process caches at once."""
+        for cache in (self.cache, self.expansion_cache, self.friend_graph):
+            if cache is not None:
+                cache.invalidate(key)
+
+    def start_command(self, message='command'):
+        self.undo_log.start_group(message)
+
+    def command_group(self, message='command'):
+        """Context manager: the writes of the block form a single undo group."""
+        return self.undo_log.command_group(message)
+
+    async def friend_entries(self, names) ->dict:
+        """
+            The memberships and friendships of the names, through the friend graph.
+            Returns: dict name -> (modules of name:_belongs_to, names of name:_friend)
+        """
+        return await self._run(connector_logic.friend_entries(self, names))
+
+    async def exists(self, key):
+        count_reads(1)
+        return await self.client.exists(key)
+
+    async def exists_many(self, keys) ->list:
+        """Existence of all the keys, pipelined in batches of settings.PIPELINE_BATCH_SIZE."""
+        return await self._run(connector_logic.exists_many(self, keys))
+
+    async def names(self) ->set:
+        count_reads(1)
+        return await self.client.smembers(settings.NAME_REGISTRY_KEY)
+
+    async def scan_set(self, key, count=None):
+        """
+            The members of the set key in batches of about count (settings.STREAM_BATCH_SIZE), read with SSCAN.
+            A member may occur in several batches when the set changes during the scan.
+        """
+        cursor = 0
+        while True:
+            count_reads(1)
+            cursor, members = await self.client.sscan(key, cursor, count=count or settings.STREAM_BATCH_SIZE)
+            if members:
+                yield members
+            if cursor == 0:
+                break
+
+    async def session_ttl(self, username):
+        """Remaining seconds of the session key of username, None if there is none."""
+        count_reads(1)
+        ms = await self.client.pttl(f'{settings.SESSION_PREFIX}{username}')
+        if ms == -2:
+            return None
+        return float('inf') if ms == -1 else ms/1000
+
+    async def start_session(self, username, seconds):
+        """Sets the session key of username to expire in seconds; seconds <= 0 removes it."""
+        key = f'{settings.SESSION_PREFIX}{username}'
+        if seconds <= 0:
+            await self.client.delete(key)
+        else:
+            await self.client.set(key, username, px=max(1, int(1000*seconds)))
+
+    async def refresh_session(self, username, seconds) ->bool:
+        """Pushes the expiry of the session key of username; False if the session is over."""
+        return bool(await self.client.pexpire(f'{settings.SESSION_PREFIX}{username}', max(1, int(1000*seconds))))
+
+    async def membership_versions(self, fields) ->list:
+        """The stamps of the cached permissions for the modules and users in fields, see session/permissions.py."""
+        count_reads(1)
+        return await self.client.hmget(settings.MEMBERSHIP_VERSIONS_KEY, fields) if fields else []
+
+    async def index_members(self, prefix, entries) ->list:
+        """Members of the index sets prefix + entry of all the entries, pipelined."""
+        return await self._run(connector_logic.index_members(self, prefix, entries))
+
+    async def value_holders(self, values) ->list:
+        """The name:property keys holding each of the values, read from the inverted value index."""
+        return await self.index_members(settings.VALUE_INDEX_PREFIX, values)
+
+    async def property_holders(self, properties) ->list:
+        """The names having each of the properties, read from the property index."""
+        return await self.index_members(settings.PROPERTY_INDEX_PREFIX, properties)
+
+    async def index_statistics(self, property_list, value_list, permitted) ->dict:
+        """
+            Cardinalities for the query planner, in one round trip: number of names, holders of
+            the explicit properties and values, members of the permitted modules.
+        """
+        return await self._run(connector_logic.index_statistics(self, property_list, value_list, permitted))
+
+    async def check(self):
+        try:
+            await self.client.ping()
+            return True
+        except:
+            return False
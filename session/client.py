@@ -9,13 +9,18 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from utils.utilities import *
 from utils.triplets import *
+from session.expressions import Expression
+from session.permissions import Permissions
+from session.steps import run, method_caller
+from session import client_logic
 
 from configs.logging_config import setup_logger
 logger = setup_logger(__file__)
 
 class DataClient:
-    def __init__(self):
-        self.server = DatabaseConnector()
+    def __init__(self, owner='system'):
+        self.server = DatabaseConnector(owner)
+        self._call = method_caller(self.server)
         self.eval = Interpreter()
         self.eval.symtable['data'] = self.server.get
         def isnumber(x):
@@ -25,6 +30,22 @@ class DataClient:
             except ValueError:
                 return  False
         self.eval.symtable['isnumber'] = isnumber
+        # the symbol table of a fresh client, restored by reset
+        self._symbols = dict(self.eval.symtable)
+
+    def reset(self, owner='system'):
+        """
+            Hands the client over to owner, see ClientPool: the writes go to the undo log of owner,
+            and the variables left in the interpreter by the expressions of the former user are dropped.
+        """
+        self.server.reset(owner)
+        self.eval.symtable.clear()
+        self.eval.symtable.update(self._symbols)
+        self.eval.error = []
+
+    def _run(self, steps):
+        """Runs steps of session/client_logic.py on the connector."""
+        return run(steps, self._call)
 
     def __contains__(self, name):
         return self.server.exists(name)
@@ -37,24 +58,26 @@ class DataClient:
             - *permitted*: allowed modules, if contains '_all', all modules are allowed
             Returns: number of added nodes
         """
-        if ':' in name or ',' in name or ';' in name:
-            logger.error(f'DataClient new: invalid name "{name}"')
-            return 0
-        if '_all' not in permitted and module not in permitted:
-            logger.error('DataClient new: not authorized')
-            return 0
-        if self.server.exists(name):
-            return 0
-        self.server.start_command('client new')
-        # to be sure that 'module' is a module
-        self.server.set(module, '_member')
-        self.server.set(f'{module}:_member', module)
+        return self._run(client_logic.new(self.server, name, module, permitted, 'DataClient'))
 
-        # add the name to the module
-        self.server.set(f'{module}:_member', name)
-        self.server.set(name, '_belongs_to')
-        self.server.set(f'{name}:_belongs_to', module)
-        return 1
+    def permissions(self, user, mode='read') ->Permissions:
+        """
+            The modules user may read or write (mode), with the names belonging to them;
+            cached per process until a write bumps the version of the user or of one of its modules,
+            and read once per command tree (see session/command_plan.py).
+        """
+        return self._run(client_logic.permissions(user, mode))
+
+    def new_many(self, names, module, permitted = ['_all']) -> int:
+        """
+            Bulk variant of new: creates the names in the given module with one pipelined
+            existence check, and writes in chunked MULTI/EXEC pipelines forming a single undo group.
+            - *names*: iterable of the names to create
+            - *module*: module where the names belong
+            - *permitted*: allowed modules, if contains '_all', all modules are allowed
+            Returns: number of added nodes
+        """
+        return self._run(client_logic.new_many(self.server, names, module, permitted, 'DataClient'))
 
     def is_module(self, name:str):
         if '_member' in self.server.get(name):
@@ -65,12 +88,14 @@ class DataClient:
         return module in self.server.get(f'{name}:_belongs_to')
 
     def in_modules(self, name, modules):
-        if modules is None:
-            return True
-        for module in modules:
-            if self.in_module(name, module):
-                return True
-        return False
+        return self._run(client_logic.in_modules(name, modules))
+
+    def permitted_names(self, names, modules) ->list:
+        """
+            The names belonging to any of the modules: filtered in memory for Permissions,
+            with one pipelined read of their _belongs_to lists otherwise.
+        """
+        return self._run(client_logic.permitted_names(names, modules))
 
     def members(self, module:str):
         return self.server.get(f'{module}:_member')
@@ -81,79 +106,53 @@ class DataClient:
             if so, names belonging to all of the given modules can appear as a property or value of name2
             Returns: True if they are friends, False otherwise
         """
-        if not self.server.exists(name) or not self.server.exists(target_name):
-            return False
-        modules = self.server.get(f'{name}:_belongs_to')
-        target_friends = self.server.get(f'{target_name}:_friend') + self.server.get(f'{target_name}:_belongs_to')
-        return len(set(modules) & set(target_friends)) > 0
+        return self._run(client_logic.are_friends(target_name, name))
 
     ##############################################################x
     # The basic get-set-delete definitions 
     ##############################################################x
 
-    def get(self, triplet, recursion_level=0, permitted = ['_all']) ->TripletSet:
+    def get(self, triplet, recursion_level=0, permitted = ['_all'], plan=None) ->TripletSet:
         """
             Basic getter.
             The meaning of arguments:
             - *triplet*: triplet (Triplet-izable entry)->name, property, value
             - *recursion_level*: number of allowed recursions, negative value means infinite allowed recursion
             - *permitted*: allowed modules, if contains '_all', all modules are allowed
+            - *plan*: GetPlan recording the chosen access path and the measured stages (see explain)
 
             Wildcarding allowed using '*'. Its meaning:
             - in name: all possible names are considered
             - in property: all properties of a name is considered
             - in value: all values in name:property is allowed
 
+            A '*' name is resolved along the cheapest access path chosen by GetPlan from
+            the cardinalities of the indices: value index, property index, members of the
+            permitted modules or the registry of all the names.
+
             Returns: set of valid triplets
         """
-        if is_iterable(triplet):
-            name, property, value = Triplet(*triplet)
-        else:
-            name, property, value = Triplet(triplet)
-        name_set      = {n.strip() for n in name.split(',')}
-        property_list = dict.fromkeys([p.strip() for p in property.split(',')])
-        value_list    = dict.fromkeys([v.strip() for v in value.split(',')])
-
-        if '*' in name_set:
-            name_set.update([ key for key in self.server.keys('*') if ':' not in key])
-            name_set.discard('*')
-        elif '_header' not in property_list:
-            name_set_add = self.get(f'{",".join(name_set)}:_header,_alias,_member:*', recursion_level=-1).select_fields(value=True)
-            name_set.update(name_set_add)
-        else:
-            property_list.pop('_header')
-            if len(property_list)==0:
-                property_list='*'
-
-        if '_all' not in permitted:
-            name_set = {n for n in name_set if self.in_modules(n, permitted)}
-
-        result = self.simple_get(name_set, property_list, value_list)
-        while recursion_level!=0:
-            recursion_level-=1
-            new_names = name_set | { n  for n in result.select_fields(name=True, property=True, value=True) if n in self}
-            if '_all' not in permitted:
-                new_names = {n for n in name_set if self.in_modules(n, permitted)}
-            if new_names == name_set:
-                break
-            name_set = new_names
-            result = self.simple_get(new_names, property_list, value_list)
-        return result
-
-    def simple_get(self, name_set, property_list, value_list) ->TripletSet:        
-        result = TripletSet()
-        for n in name_set:
-            if '*' in property_list:
-                p_list = self.server.get(n)
-            else:
-                p_list = property_list.copy()
-            for p in p_list:
-                allowed_values = self.server.get(f'{n}:{p}')
-                if '*' in value_list:
-                    result.update( [Triplet(n,p,v) for v in allowed_values])
-                else:
-                    result.update( [Triplet(n,p,v) for v in value_list if v in allowed_values] )
-        return result
+        return self._run(client_logic.get(self.server, triplet, recursion_level, permitted, plan))
+
+    def expand(self, name_set) ->set:
+        """
+            The values of the _alias and _member lists reachable from the names,
+            memoized per name in the expansion cache of the connector.
+        """
+        return self._run(client_logic.expand(self.server, name_set))
+
+    def indexed_get(self, property_list, value_list) ->TripletSet:
+        """
+            Getter over all the names for explicit values, read from the inverted value index.
+        """
+        return self._run(client_logic.indexed_get(property_list, value_list))
+
+    def simple_get(self, name_set, property_list, value_list) ->TripletSet:
+        """
+            Non-recursive getter over explicit names, in two pipelined phases:
+            the property lists of all the names, then all the name:property value lists.
+        """
+        return self._run(client_logic.simple_get(name_set, property_list, value_list))
 
     def __getitem__(self, triplet)  -> TripletSet:
         return self.get(triplet)
@@ -169,43 +168,29 @@ class DataClient:
 
             Returns: number of added nodes
         """
-        if is_iterable(triplet):
-            name, property, value = Triplet(*triplet)
-        else:
-            name, property, value = Triplet(triplet)
-        name_set      = dict.fromkeys([n.strip() for n in name.split(',')])
-        property_list = dict.fromkeys([p.strip() for p in property.split(',')])
-        value_list    = dict.fromkeys([v.strip() for v in value.split(',')])
-
-        if '*' in value_list:
-            value_list = ['_property']
-
-        if '_all' not in permitted:
-            name_set = {n for n in name_set if self.in_modules(n, permitted)}
-
-        self.server.start_command('client set')
-        added_nodes = 0
-
-        for name in name_set:
-            if not self.server.exists(name):
-                logger.warning(f'DataCommand set: name {name} does not exist')
-                continue
-            for property in property_list:
-                if property == '*':
-                    logger.warning(f'DataCommand set: property "*" is not allowed')
-                    continue
-                added_nodes += self.server.set(name, property)
-                for value in value_list:
-                    if value in ['_member', '_belongs_to']:
-                        continue
-                    added_nodes += self.server.set(f'{name}:{property}', value)
-                    if self.are_friends(property, name):
-                        self.server.set(property, value)
-                        added_nodes += self.server.set(f'{property}:{value}', name)                            
-                    if self.are_friends(value, name):
-                        self.server.set(value, name)
-                        added_nodes += self.server.set(f'{value}:{name}',property) 
-        return added_nodes
+        return self.set_groups([[triplet]], permitted, 'client set')[0]
+
+    def set_many(self, triplets, permitted = ['_all']) -> int:
+        """
+            Bulk setter: the same as set for every triplet in order, with the existence and friendship
+            checks resolved in one pipelined read each, and the writes sent in chunked MULTI/EXEC
+            pipelines forming a single undo group.
+            - *triplets*: iterable of triplets to set (Triplet-izable entries)
+            - *permitted*: allowed modules, if contains '_all', all modules are allowed
+            Returns: number of added nodes
+        """
+        return self.set_groups([triplets], permitted)[0]
+
+    def set_groups(self, groups, permitted = ['_all'], message='client set_many') -> list:
+        """
+            set_many of several groups of triplets at once, e.g. the triplets of consecutive set commands:
+            the groups are written in order in the same pipelines and undo group.
+            - *groups*: list of iterables of triplets
+            - *permitted*: allowed modules, if contains '_all', all modules are allowed
+            - *message*: command of the undo group
+            Returns: number of added nodes of every group
+        """
+        return self._run(client_logic.set_groups(self.server, groups, permitted, 'DataClient', message))
 
     def delete(self, triplet, permitted = ['_all']) -> int:
         """
@@ -219,25 +204,7 @@ class DataClient:
 
             Returns: number of deleted nodes
         """
-        if '_all' not in permitted:
-            name_set = {n for n in name_set if self.in_modules(n, permitted)}
-
-        self.server.start_command('client delete')
-        deleted_nodes=0
-
-        triplets_to_delete = self.get(triplet=triplet, permitted=permitted)
-        for name, property, value in triplets_to_delete._items.copy():
-            if self.are_friends(property, name):
-                triplets_to_delete.update([Triplet(property, value, name)])
-            if self.are_friends(value, name):
-                triplets_to_delete.update([Triplet(value, name, property)])
-        for name, property, value in triplets_to_delete:
-            if property == '_belongs_to':
-                deleted_nodes += self.server.delete(f'{value}:_member', name)
-            deleted_nodes += self.server.delete(f'{name}:{property}', value)
-            if not self.server.exists(f'{name}:{property}'):
-                deleted_nodes += self.server.delete(name, property)
-        return deleted_nodes
+        return self._run(client_logic.delete(self.server, triplet, permitted))
 
     ###############################################################
     # additional methods for triplet sets
@@ -249,10 +216,7 @@ class DataClient:
             - *triplets*: list of triplets to set
             Returns: number of added nodes
         """
-        added_nodes = 0
-        for triplet in triplets:
-            added_nodes += self.set(triplet, permitted)
-        return added_nodes
+        return self.set_many(triplets, permitted)
 
     def save(self, triplets, filename, delete=True, permitted = ['_all']):
         """
@@ -285,25 +249,18 @@ class DataClient:
         if '_all' not in permitted and not self.in_modules(module, permitted):
             logger.error(f'DataClient load_from_json: not authorized to write into {module}')
             return 0
-        added_nodes = 0
-        for name, element in data.items():
-            added_nodes += self.new(name, module)
-            for property, values in element.items():
-                added_nodes += self.set(f'{name}:{property}:' + ','.join(values), permitted=permitted)
+        with self.server.command_group('client load'):
+            added_nodes = self.new_many(data, module)
+            added_nodes += self.set_many([f'{name}:{property}:' + ','.join(values)
+                                          for name, element in data.items() for property, values in element.items()], permitted=permitted)
         return added_nodes
     
     def to_execute(self, command):
-        def my_execute(x,y,z):
-            resp = self.eval(command.replace("name", f"{x}")
-                    .replace("property", f"{y}")
-                    .replace("value", f"{z}")
-                    .replace("triplet", f"{x}:{y}:{z}")
-            )
-            if not self.eval.error:
-                return resp
-            else:
-                raise ValueError(f"Error in command '{command}': {self.eval.error_msg}")
-        return my_execute      
+        """
+            The expression compiled once into a function of (name, property, value),
+            with the variables name, property, value and triplet bound, see session/expressions.py.
+        """
+        return Expression(self.eval, command)
 
     def transform_by_function(self, triplets, function):
         return TripletSet([y for t in triplets if (y:=function(*t)) is not None])
@@ -312,5 +269,4 @@ class DataClient:
         return self.transform_by_function(triplets, self.to_execute(command))
     
     def filter(self, triplets, command):
-        command_function = self.to_execute(command)
-        return TripletSet([t for t in triplets if command_function(*t)])
\ No newline at end of file
+        return TripletSet(self.to_execute(command).filter(triplets))
\ No newline at end of file
@@ -0,0 +1,313 @@
+# The logic of DataClient and AsyncDataClient, as steps (see session/steps.py): a request is a
+# call of a connector method, (method, *args), run by DataClient on its DatabaseConnector and
+# awaited by AsyncDataClient on its AsyncDatabaseConnector. The functions take the connector
+# for what is not I/O: its caches, read counter and undo groups; *caller* names the client in the logs.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.utilities import *
+from utils.triplets import *
+from session.planner import GetPlan
+from session.permissions import shared_permission_sets
+from session.command_plan import current_context
+
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+def parse(triplet) ->tuple:
+    """The comma-separated names, properties and values of a triplet, as dicts keeping their order."""
+    if is_iterable(triplet):
+        name, property, value = Triplet(*triplet)
+    else:
+        name, property, value = Triplet(triplet)
+    return (dict.fromkeys([n.strip() for n in name.split(',')]),
+            dict.fromkeys([p.strip() for p in property.split(',')]),
+            dict.fromkeys([v.strip() for v in value.split(',')]))
+
+def valid_name(name) ->bool:
+    return not (':' in name or ',' in name or ';' in name)
+
+def module_writes(module, names) ->list:
+    """The (key, value) writes adding the names to module, made a module first."""
+    writes = [(module, '_member'), (f'{module}:_member', module)]
+    for name in names:
+        writes += [(f'{module}:_member', name), (name, '_belongs_to'), (f'{name}:_belongs_to', module)]
+    return writes
+
+def befriended(entries, target_name, name) ->bool:
+    """Whether a module of name is target_name, one of its modules or one of its friends; entries of friend_entries."""
+    return len(entries[name][0] & (entries[target_name][1] | entries[target_name][0])) > 0
+
+def permissions(user, mode):
+    context = current_context()
+    if context is not None and context.user == user and mode in context.permissions:
+        return context.permissions[mode]
+    permissions = yield from shared_permission_sets().steps(user, mode)
+    if context is not None and context.user == user:
+        context.permissions[mode] = permissions
+    return permissions
+
+def new(server, name, module, permitted, caller):
+    if not valid_name(name):
+        logger.error(f'{caller} new: invalid name "{name}"')
+        return 0
+    if '_all' not in permitted and module not in permitted:
+        logger.error(f'{caller} new: not authorized')
+        return 0
+    if (yield 'exists', name):
+        return 0
+    server.start_command('client new')
+    for key, value in module_writes(module, [name]):
+        yield 'set', key, value
+    return 1
+
+def new_many(server, names, module, permitted, caller):
+    if '_all' not in permitted and module not in permitted:
+        logger.error(f'{caller} new_many: not authorized')
+        return 0
+    candidates = []
+    for name in dict.fromkeys(names):
+        if not valid_name(name):
+            logger.error(f'{caller} new_many: invalid name "{name}"')
+            continue
+        candidates.append(name)
+    created = []
+    for name, exists in zip(candidates, (yield 'exists_many', candidates)):
+        # the module itself exists once the first name is created
+        if exists or (name == module and created):
+            continue
+        created.append(name)
+    if not created:
+        return 0
+    with server.command_group('client new_many'):
+        yield 'set_many', module_writes(module, created)
+    return len(created)
+
+def in_modules(name, modules):
+    if modules is None:
+        return True
+    if getattr(modules, 'names', None) is not None:
+        return name in modules.names
+    for module in modules:
+        if module in (yield 'get', f'{name}:_belongs_to'):
+            return True
+    return False
+
+def permitted_names(names, modules):
+    names = list(names)
+    if getattr(modules, 'names', None) is not None:
+        return [n for n in names if n in modules.names]
+    modules = set(modules)
+    belongs = yield 'get_many', [f'{n}:_belongs_to' for n in names]
+    return [n for n, b in zip(names, belongs) if modules & set(b)]
+
+def are_friends(target_name, name):
+    # a name that does not exist has no lists: the lists decide alone
+    return befriended((yield 'friend_entries', [target_name, name]), target_name, name)
+
+def get(server, triplet, recursion_level=0, permitted=['_all'], plan=None):
+    name_set, property_list, value_list = parse(triplet)
+    name_set = set(name_set)
+    if plan is None:
+        plan = GetPlan()
+
+    if '*' in name_set:
+        name_set.discard('*')
+        # all the names are considered: recursion cannot add any
+        recursion_level = 0
+        with plan.stage('plan'):
+            plan.choose((yield 'index_statistics', property_list, value_list, permitted), property_list, value_list, permitted)
+        if plan.path == 'value_index':
+            with plan.stage('fetch'):
+                result = yield from indexed_get(property_list, value_list)
+            if '_all' not in permitted:
+                with plan.stage('permissions'):
+                    names = set((yield from permitted_names({t.data[0] for t in result}, permitted)))
+                    result = TripletSet([t for t in result if t.data[0] in names])
+            return result
+        with plan.stage('names'):
+            if plan.path == 'property_index':
+                for holders in (yield 'property_holders', list(property_list)):
+                    name_set.update(holders)
+            elif plan.path == 'permitted_names':
+                name_set.update(permitted.names)
+            elif plan.path == 'module_members':
+                # the _belongs_to lists decide the membership, as in the permissions
+                for holders in (yield 'value_holders', list(permitted)):
+                    name_set.update(n for n, _, p in (key.partition(':') for key in holders) if p == '_belongs_to')
+            else:
+                name_set.update((yield 'names',))
+    elif '_header' not in property_list:
+        with plan.stage('names'):
+            name_set.update((yield from expand(server, name_set)))
+    else:
+        property_list.pop('_header')
+        if len(property_list)==0:
+            property_list='*'
+
+    if '_all' not in permitted:
+        with plan.stage('permissions'):
+            name_set = set((yield from permitted_names(name_set, permitted)))
+
+    with plan.stage('fetch'):
+        result = yield from simple_get(name_set, property_list, value_list)
+    if recursion_level!=0:
+        with plan.stage('recursion'):
+            # breadth-first: only the names discovered at the previous level are fetched
+            visited = set(name_set)
+            found = result
+            while recursion_level!=0:
+                recursion_level-=1
+                candidates = [n for n in found.select_fields(name=True, property=True, value=True) if n not in visited]
+                visited.update(candidates)
+                frontier = [n for n, exists in zip(candidates, (yield 'exists_many', candidates)) if exists]
+                if '_all' not in permitted:
+                    frontier = yield from permitted_names(frontier, permitted)
+                if not frontier:
+                    break
+                found = yield from simple_get(frontier, property_list, value_list)
+                result.update(found)
+    return result
+
+def expand(server, name_set):
+    cache = server.expansion_cache
+    expanded = set()
+    missed = []
+    for name in name_set:
+        expansion = cache.lookup(name) if cache is not None else None
+        if expansion is None:
+            missed.append(name)
+        else:
+            expanded.update(expansion)
+    if not missed:
+        return expanded
+    generation = cache.generation if cache is not None else None
+    lists = yield from expansion_lists(missed)
+    for name in missed:
+        # every name met by the traversal: a change of its lists may change the expansion
+        reached = {name}
+        frontier = [name]
+        while frontier:
+            frontier = [v for n in frontier for v in lists[n] if v not in reached]
+            reached.update(frontier)
+        expansion = {v for n in reached for v in lists[n]}
+        if cache is not None:
+            cache.store(name, expansion, reached, generation)
+        expanded.update(expansion)
+    return expanded
+
+def expansion_lists(names):
+    """The _alias and _member values of the names and of all the names reachable from them, one get_many per level."""
+    lists = {}
+    frontier = list(dict.fromkeys(names))
+    while frontier:
+        values = yield 'get_many', [f'{n}:{p}' for n in frontier for p in ('_alias', '_member')]
+        for index, name in enumerate(frontier):
+            lists[name] = list(dict.fromkeys(values[2*index] + values[2*index+1]))
+        frontier = list(dict.fromkeys(v for n in frontier for v in lists[n] if v not in lists))
+    return lists
+
+def indexed_get(property_list, value_list):
+    result = TripletSet()
+    for v, holders in zip(value_list, (yield 'value_holders', list(value_list))):
+        for key in holders:
+            n, p = key.split(':', 1)
+            if '*' in property_list or p in property_list:
+                result.add(Triplet(n,p,v))
+    return result
+
+def simple_get(name_set, property_list, value_list):
+    result = TripletSet()
+    name_list = list(name_set)
+    if '*' in property_list:
+        p_lists = yield 'get_many', name_list
+    else:
+        p_lists = [list(property_list)] * len(name_list)
+    pairs = [ (n,p) for n, p_list in zip(name_list, p_lists) for p in p_list ]
+    values = yield 'get_many', [f'{n}:{p}' for n,p in pairs]
+    for (n,p), allowed_values in zip(pairs, values):
+        if '*' in value_list:
+            result.update( [Triplet(n,p,v) for v in allowed_values])
+        else:
+            result.update( [Triplet(n,p,v) for v in value_list if v in allowed_values] )
+    return result
+
+def set_groups(server, groups, permitted, caller, message='client set_many'):
+    entries = []
+    for index, triplets in enumerate(groups):
+        for triplet in triplets:
+            name_set, property_list, value_list = parse(triplet)
+            if '*' in value_list:
+                value_list = ['_property']
+            entries.append((index, name_set, property_list, value_list))
+
+    names = list({n for _, name_set, _, _ in entries for n in name_set})
+    if '_all' not in permitted:
+        names = yield from permitted_names(names, permitted)
+    allowed = set(names)
+    existing = {n for n, exists in zip(names, (yield 'exists_many', names)) if exists}
+    graph = {n: (set(modules), set(friends)) for n, (modules, friends) in (yield 'friend_entries',
+        [x for _, name_set, property_list, value_list in entries for x in [*name_set, *property_list, *value_list]]).items()}
+
+    writes = []     # (key, value, group counting it in its added nodes, None if not counted)
+    index = None
+    def write(key, value, counted=True):
+        writes.append((key, value, index if counted else None))
+        # the memberships and friendships written by the batch apply to its later triplets
+        name, _, property = key.partition(':')
+        if name in graph and property == '_belongs_to':
+            graph[name][0].add(value)
+        elif name in graph and property == '_friend':
+            graph[name][1].add(value)
+
+    for index, name_set, property_list, value_list in entries:
+        for name in name_set:
+            if name not in existing:
+                if name in allowed:
+                    logger.warning(f'{caller} set: name {name} does not exist')
+                continue
+            for property in property_list:
+                if property == '*':
+                    logger.warning(f'{caller} set: property "*" is not allowed')
+                    continue
+                write(name, property)
+                for value in value_list:
+                    if value in ['_member', '_belongs_to']:
+                        continue
+                    write(f'{name}:{property}', value)
+                    if befriended(graph, property, name):
+                        write(property, value, counted=False)
+                        write(f'{property}:{value}', name)
+                    if befriended(graph, value, name):
+                        write(value, name, counted=False)
+                        write(f'{value}:{name}', property)
+    added_nodes = [0] * len(groups)
+    if not writes:
+        return added_nodes
+    with server.command_group(message):
+        results = yield 'set_many', [(key, value) for key, value, _ in writes]
+    for (_, _, group), position in zip(writes, results):
+        if group is not None and position >= 0:
+            added_nodes[group] += 1
+    return added_nodes
+
+def delete(server, triplet, permitted=['_all']):
+    server.start_command('client delete')
+    deleted_nodes=0
+
+    triplets_to_delete = yield from get(server, triplet=triplet, permitted=permitted)
+    entries = yield 'friend_entries', list(triplets_to_delete.select_fields(name=True, property=True, value=True))
+    for name, property, value in triplets_to_delete._items.copy():
+        if befriended(entries, property, name):
+            triplets_to_delete.update([Triplet(property, value, name)])
+        if befriended(entries, value, name):
+            triplets_to_delete.update([Triplet(value, name, property)])
+    for name, property, value in triplets_to_delete:
+        if property == '_belongs_to':
+            deleted_nodes += yield 'delete', f'{value}:_member', name
+        deleted_nodes += yield 'delete', f'{name}:{property}', value
+        if not (yield 'exists', f'{name}:{property}'):
+            deleted_nodes += yield 'delete', name, property
+    return deleted_nodes
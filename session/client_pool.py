@@ -0,0 +1,134 @@
+import threading
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from session.client import DataClient
+from session.async_client import AsyncDataClient
+from configs.settings import settings
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+class ClientLease:
+    """
+        A (DataClient, AsyncDataClient) pair lent by a ClientPool to a user, and held by the running
+        commands of the user: a pair given back at logout is reset only once no command holds it.
+        - *users*: number of running commands holding the pair
+        - *returned*: whether the user logged out
+    """
+    def __init__(self, pool, data_client, async_data_client):
+        self.pool = pool
+        self.data_client = data_client
+        self.async_data_client = async_data_client
+        self.users = 0
+        self.returned = False
+
+    def close(self):
+        """Ends the hold of a command, see ClientPool.hold."""
+        if self.pool is not None:
+            self.pool.drop(self)
+
+class ClientPool:
+    """
+        Idle (DataClient, AsyncDataClient) pairs, built in advance and lent to the logged-in users,
+        so that a login does not build an asteval Interpreter, Redis clients and Lua script handles.
+        A pair comes back at the logout of its user and, once no running command holds it, is reset:
+        it is handed to the next user with the pristine symbol table of its interpreter and the
+        undo log of the new owner. When fewer than low_water pairs are idle after an acquire,
+        the pool is refilled in a background thread.
+        - *size*: number of idle pairs kept, settings.CLIENT_POOL_SIZE by default
+        - *low_water*: settings.CLIENT_POOL_LOW_WATER by default, 0 never refills the pool
+    """
+    def __init__(self, size=None, low_water=None):
+        self.size = settings.CLIENT_POOL_SIZE if size is None else size
+        self.low_water = settings.CLIENT_POOL_LOW_WATER if low_water is None else low_water
+        self._idle = []
+        self._lent = {}     # id(DataClient) -> ClientLease
+        self._lock = threading.Lock()
+        self._refill = None
+        # pairs lent from the idle ones, and built on demand because the pool was empty
+        self.reused = 0
+        self.built = 0
+
+    def warm(self):
+        """Fills the pool up to its size."""
+        with self._lock:
+            missing = self.size - len(self._idle)
+        pairs = [(DataClient(), AsyncDataClient()) for _ in range(missing)]
+        with self._lock:
+            self._idle += pairs[:self.size - len(self._idle)]
+        logger.info(f'ClientPool: {len(self._idle)} idle clients')
+
+    def _refill_in_background(self):
+        """Starts a refill unless one is running; called with the lock held."""
+        if len(self._idle) >= min(self.low_water, self.size) or (self._refill is not None and self._refill.is_alive()):
+            return
+        self._refill = threading.Thread(target=self.warm, name='client-pool', daemon=True)
+        self._refill.start()
+
+    def acquire(self, owner):
+        """Returns: a (DataClient, AsyncDataClient) pair working for owner"""
+        with self._lock:
+            pair = self._idle.pop() if self._idle else None
+            if pair is None:
+                self.built += 1
+            else:
+                self.reused += 1
+            self._refill_in_background()
+        if pair is None:
+            pair = DataClient(owner=owner), AsyncDataClient(owner=owner)
+        else:
+            for client in pair:
+                client.reset(owner)
+        with self._lock:
+            self._lent[id(pair[0])] = ClientLease(self, *pair)
+        return pair
+
+    def hold(self, data_client, async_data_client) ->ClientLease:
+        """
+            Holds a pair for a running command, until the close of the returned lease;
+            a pair not lent by the pool (the system clients) is not tracked.
+        """
+        with self._lock:
+            lease = self._lent.get(id(data_client))
+            if lease is None:
+                return ClientLease(None, data_client, async_data_client)
+            lease.users += 1
+            return lease
+
+    def drop(self, lease):
+        """Ends a hold of the pair; the last one recycles a pair given back meanwhile."""
+        with self._lock:
+            lease.users -= 1
+            idle = lease.returned and lease.users == 0
+        if idle:
+            self._recycle(lease)
+
+    def release(self, data_client, async_data_client):
+        """Takes back a pair of acquire, at the logout of its user; it is dropped if the pool is full."""
+        if data_client is None or async_data_client is None:
+            return
+        with self._lock:
+            lease = self._lent.get(id(data_client))
+            if lease is None:
+                return
+            lease.returned = True
+            idle = lease.users == 0
+        if idle:
+            self._recycle(lease)
+
+    def _recycle(self, lease):
+        with self._lock:
+            self._lent.pop(id(lease.data_client), None)
+        lease.data_client.reset()
+        lease.async_data_client.reset()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((lease.data_client, lease.async_data_client))
+
+    def __len__(self):
+        return len(self._idle)
+
+    def __repr__(self):
+        return f"ClientPool({len(self._idle)}/{self.size} idle, reused={self.reused}, built={self.built})"
@@ -0,0 +1,147 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from configs.settings import settings
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+@dataclass(frozen=True)
+class CommandNode:
+    """
+        A command parsed into its plan tree.
+        - *text*: the command text
+        - *keyword*, *argument*: as split by SessionManager.split_command
+        - *parts*: the argument as literal strings and sub-command nodes, in order;
+          None if its parentheses are mismatched
+    """
+    text: str
+    keyword: str
+    argument: str
+    parts: tuple|None
+
+    @property
+    def subcommands(self) ->list:
+        return [] if self.parts is None else [p for p in self.parts if isinstance(p, CommandNode)]
+
+def split_parts(text, start_delim='(', end_delim=')'):
+    """
+        Splits text into its literal strings and the texts of its outermost (...) sub-commands.
+        Returns: list of (is_subcommand, text), None if the delimiters are mismatched
+    """
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(text):
+        if c == start_delim:
+            if depth == 0:
+                parts.append((False, text[start:i]))
+                start = i+1
+            depth += 1
+        elif c == end_delim:
+            depth -= 1
+            if depth < 0:
+                break
+            if depth == 0:
+                parts.append((True, text[start:i]))
+                start = i+1
+    if depth != 0:
+        logger.error("Mismatched parentheses")
+        return None
+    parts.append((False, text[start:]))
+    return [(sub, part) for sub, part in parts if sub or part]
+
+class CommandParser:
+    """
+        Parses command texts into CommandNode trees, once per text: the trees are kept
+        in a bounded table, a command and its repeated sub-commands are not parsed again.
+        - *split_command*: function text -> (keyword, argument)
+        - *max_entries*: size of the table of parsed texts
+    """
+    def __init__(self, split_command, max_entries=10000):
+        self.split_command = split_command
+        self.max_entries = max_entries
+        self._commands = {}     # command text -> CommandNode
+        self._arguments = {}    # argument text -> parts
+        self._lock = threading.Lock()
+
+    def _remember(self, table, text, value):
+        with self._lock:
+            if len(table) >= self.max_entries:
+                table.clear()
+            table[text] = value
+        return value
+
+    def parse(self, text) ->CommandNode:
+        node = self._commands.get(text)
+        if node is None:
+            keyword, argument = self.split_command(text)
+            node = self._remember(self._commands, text, CommandNode(text, keyword, argument, self.parts(argument)))
+        return node
+
+    def parts(self, text):
+        """The literal strings and sub-command nodes of an argument text, None if its parentheses are mismatched."""
+        if text in self._arguments:
+            return self._arguments[text]
+        split = split_parts(text)
+        parts = None if split is None else tuple(self.parse(part) if sub else part for sub, part in split)
+        return self._remember(self._arguments, text, parts)
+
+@dataclass
+class ExecutionContext:
+    """
+        The authentication context of a command tree: its sub-commands run with the user,
+        the clients and the permissions of the root command, without authenticating again.
+        - *permissions*: mode -> Permissions, read once for the whole tree
+        - *slots*: the sub-commands that may still run in parallel with the thread or task of the
+          root command: settings.SUBCOMMAND_CONCURRENCY - 1, so that at most SUBCOMMAND_CONCURRENCY run at once
+        - *lease*: the ClientLease of the clients, closed when the root command ends
+        - *reads*: keys read by the tree so far, cache hits included: the measure of the query planner
+    """
+    user: str
+    token: str
+    data_client: object = None
+    async_data_client: object = None
+    permissions: dict = field(default_factory=dict)
+    slots: threading.BoundedSemaphore = field(default_factory=lambda: threading.BoundedSemaphore(max(settings.SUBCOMMAND_CONCURRENCY - 1, 0)))
+    lease: object = None
+    reads: int = 0
+    _reads_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count_reads(self, count):
+        with self._reads_lock:
+            self.reads += count
+
+# the context of the command tree being executed by the running task or thread
+_context = ContextVar('command_context', default=None)
+
+def current_context(token=None):
+    """The running ExecutionContext, None outside a command or for another token."""
+    context = _context.get()
+    if context is None or (token is not None and context.token != token):
+        return None
+    return context
+
+def count_reads(count):
+    """Counts key reads of the connectors in the running ExecutionContext; outside a command they are not counted."""
+    context = _context.get()
+    if context is not None:
+        context.count_reads(count)
+
+def current_reads() ->int:
+    """Keys read so far by the running command tree, see count_reads."""
+    context = _context.get()
+    return 0 if context is None else context.reads
+
+@contextmanager
+def command_context(context):
+    token = _context.set(context)
+    try:
+        yield context
+    finally:
+        _context.reset(token)
@@ -37,7 +37,7 @@ def save_or_archive(**kwargs):
 
     #only the system client is allowed to write to disk to avoid corrupted archive files
     system_client = session.login_data["system"]
-    permitted = data_client.simple_get([user],['write'],['*']).format('value')
+    permitted = data_client.permissions(user, 'write')
     saved_items = 0
     for x in argument.split(';'):
         module = x.strip()
@@ -60,7 +60,7 @@ def load_function(**kwargs):
 
     response = CommandResponse(command = 'load ' + argument)
 
-    permitted = data_client.simple_get([user],['write'],['*']).format('value')
+    permitted = data_client.permissions(user, 'write')
     argument_list = argument.split(';')
     main_module = argument_list.pop(0).strip()
     if '_all' not in permitted and main_module not in permitted:
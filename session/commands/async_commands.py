@@ -0,0 +1,141 @@
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from session.manager import SessionManager
+from session.commands.basic_commands import parse_recursion
+from configs.response_model import CommandResponse
+
+from utils.utilities import *
+from utils.triplets import *
+from session.async_client import AsyncDataClient
+
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+# Awaitable handlers of the storage commands, used by SessionManager.acommand.
+# They mirror the sync handlers of basic_commands.py.
+# The streaming get of SessionManager.astream yields its output in chunks.
+
+@SessionManager.register_async("new")
+async def async_new_function(**kwargs):
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:AsyncDataClient = kwargs["data_client"]
+    token = kwargs["token"]
+    session:SessionManager = kwargs["session"]
+
+    response = CommandResponse(command = "new " + argument)
+
+    permitted = await data_client.permissions(user, 'write')
+    argument = await session.anested_replace(argument, token)
+    argument_list=[x.strip() for x in argument.split(';')]
+    module = argument_list.pop(0).strip()
+    added_nodes = 0
+    for name in argument_list:
+        added_nodes = await data_client.new(name, module, permitted)
+    response.message = f'added {added_nodes} new nodes'
+    response.success=True
+    return response
+
+@SessionManager.register_async("get")
+async def async_get_function(**kwargs):
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:AsyncDataClient = kwargs["data_client"]
+    token = kwargs["token"]
+    session:SessionManager = kwargs["session"]
+
+    response = CommandResponse(command = "get " + argument)
+
+    permitted = await data_client.permissions(user, 'read')
+    argument = await session.anested_replace(argument, token, item_separator=',', entry_separator=',')
+    argument_list=[x.strip() for x in argument.split(';')]
+    recursion_level = parse_recursion(argument_list, response)
+    result_set = TripletSet()
+    for arg in argument_list:
+        result_set.update(await data_client.get(arg, recursion_level=recursion_level, permitted=permitted))
+    response.output=result_set
+    response.message += "success"
+    response.success=True
+    return response
+
+@SessionManager.register_stream("get")
+async def stream_get_function(**kwargs):
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:AsyncDataClient = kwargs["data_client"]
+    token = kwargs["token"]
+    session:SessionManager = kwargs["session"]
+    response:CommandResponse = kwargs["response"]
+
+    response.command = "get " + argument
+
+    permitted = await data_client.permissions(user, 'read')
+    argument = await session.anested_replace(argument, token, item_separator=',', entry_separator=',')
+    argument_list=[x.strip() for x in argument.split(';')]
+    recursion_level = parse_recursion(argument_list, response)
+    # a single argument yields every triplet once; several ones may overlap
+    seen = TripletSet() if len(argument_list) > 1 else None
+    for arg in argument_list:
+        async for chunk in data_client.iter_get(arg, recursion_level=recursion_level, permitted=permitted):
+            if seen is not None:
+                chunk = chunk - seen
+                seen.update(chunk)
+            if chunk:
+                yield chunk
+    response.message += "success"
+    response.success=True
+
+@SessionManager.register_async("set")
+async def async_set_function(**kwargs):
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:AsyncDataClient = kwargs["data_client"]
+    token = kwargs["token"]
+    session:SessionManager = kwargs["session"]
+
+    response = CommandResponse(command = "set " + argument)
+
+    permitted = await data_client.permissions(user, 'write')
+
+    argument = await session.anested_replace(argument, token)
+    triplet_list=TripletSet([Triplet(x.strip()) for x in argument.split(';')])
+
+    addednodes= 0
+    for name,property,value in triplet_list:
+        if property=='password' and await data_client.in_module(name, 'users'):
+            await data_client.delete(f'{name}:password', permitted=permitted)
+            # bcrypt is CPU bound, keep it off the event loop
+            hashed = await asyncio.to_thread(session.pwd_context.hash, value)
+            addednodes += await data_client.set(f'{name}:password:{hashed}')
+        else:
+            addednodes += await data_client.set((name, property, value), permitted=permitted)
+    response.message = f"added {addednodes} entries"
+    response.success=True
+    return response
+
+@SessionManager.register_async("delete", "del")
+async def async_delete_function(**kwargs):
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:AsyncDataClient = kwargs["data_client"]
+    token = kwargs["token"]
+    session:SessionManager = kwargs["session"]
+
+    response = CommandResponse(command = "delete " + argument)
+
+    permitted = await data_client.permissions(user, 'write')
+
+    argument = await session.anested_replace(argument, token)
+    triplet_list=TripletSet([Triplet(x.strip()) for x in argument.split(';')])
+
+    deleted_nodes = 0
+
+    for triplet in triplet_list:
+        deleted_nodes += await data_client.delete(triplet, permitted=permitted)
+
+    response.message = f'{deleted_nodes} entries are deleted'
+    response.success = True
+    return response
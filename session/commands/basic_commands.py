@@ -10,6 +10,7 @@ from configs.response_model import CommandResponse
 from utils.utilities import *
 from utils.triplets import *
 from session.client import DataClient
+from session.planner import GetPlan
 
 from configs.logging_config import setup_logger
 logger = setup_logger(__file__)
@@ -25,7 +26,7 @@ def new_function(**kwargs):
 
     response = CommandResponse(command = "new " + argument)
 
-    permitted = data_client.simple_get([user],['write'],['*']).format('value')
+    permitted = data_client.permissions(user, 'write')
     argument = session.nested_replace(argument, token)
     argument_list=[x.strip() for x in argument.split(';')]
     module = argument_list.pop(0).strip()
@@ -36,19 +37,11 @@ def new_function(**kwargs):
     response.success=True
     return response
 
-@SessionManager.register("get")
-def get_function(**kwargs):
-    argument = kwargs["argument"]
-    user = kwargs["user"]
-    data_client:DataClient = kwargs["data_client"]
-    token = kwargs["token"]
-    session:SessionManager = kwargs["session"]
-
-    response = CommandResponse(command = "get " + argument)
-    
-    permitted = data_client.simple_get([user],['read'],['*']).format('value')
-    argument = session.nested_replace(argument, token, item_separator=',', entry_separator=',')
-    argument_list=[x.strip() for x in argument.split(';')]
+def parse_recursion(argument_list, response:CommandResponse):
+    """
+        Pops the optional leading "recursive" or "recursive:level:N" entry of a get argument list.
+        Returns: recursion level, -1 means infinite
+    """
     check_recursive = argument_list[0].split(':')
     recursion_level=0
     if check_recursive.pop(0).strip() == "recursive":
@@ -66,6 +59,22 @@ def get_function(**kwargs):
             except:
                 logger.info(f'DataCommand get: syntax error in recursion level setting')
                 response.message = f'syntax error in recursion level setting'
+    return recursion_level
+
+@SessionManager.register("get")
+def get_function(**kwargs):
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:DataClient = kwargs["data_client"]
+    token = kwargs["token"]
+    session:SessionManager = kwargs["session"]
+
+    response = CommandResponse(command = "get " + argument)
+    
+    permitted = data_client.permissions(user, 'read')
+    argument = session.nested_replace(argument, token, item_separator=',', entry_separator=',')
+    argument_list=[x.strip() for x in argument.split(';')]
+    recursion_level = parse_recursion(argument_list, response)
     result_set = TripletSet()
     for arg in argument_list:
         result_set.update(data_client.get(arg, recursion_level=recursion_level, permitted=permitted))    
@@ -75,6 +84,30 @@ def get_function(**kwargs):
     return response
 
 
+@SessionManager.register("explain")
+def explain_function(**kwargs):
+    """Usage: explain [recursive[:level:N];] <triplet> [;<triplet>...] -- access path, key reads and stage times of get"""
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:DataClient = kwargs["data_client"]
+    token = kwargs["token"]
+    session:SessionManager = kwargs["session"]
+
+    response = CommandResponse(command = "explain " + argument)
+
+    permitted = data_client.permissions(user, 'read')
+    argument = session.nested_replace(argument, token, item_separator=',', entry_separator=',')
+    argument_list=[x.strip() for x in argument.split(';')]
+    recursion_level = parse_recursion(argument_list, response)
+    response.output = []
+    for arg in argument_list:
+        plan = GetPlan()
+        result = data_client.get(arg, recursion_level=recursion_level, permitted=permitted, plan=plan)
+        response.output += [f'query:{arg}', *plan.report(), f'triplets:{len(result)}']
+    response.message += "success"
+    response.success=True
+    return response
+
 @SessionManager.register("set")
 def set_function(**kwargs):
     argument = kwargs["argument"]
@@ -85,7 +118,7 @@ def set_function(**kwargs):
 
     response = CommandResponse(command = "set " + argument)
 
-    permitted = data_client.simple_get([user],['write'],['*']).format('value')
+    permitted = data_client.permissions(user, 'write')
 
     argument = session.nested_replace(argument, token)
     triplet_list=TripletSet([Triplet(x.strip()) for x in argument.split(';')])
@@ -111,7 +144,7 @@ def delete_function(**kwargs):
 
     response = CommandResponse(command = "delete " + argument)
 
-    permitted = data_client.simple_get([user],['write'],['*']).format('value')
+    permitted = data_client.permissions(user, 'write')
 
     argument = session.nested_replace(argument, token)
     triplet_list=TripletSet([Triplet(x.strip()) for x in argument.split(';')])
@@ -128,28 +161,78 @@ def delete_function(**kwargs):
 
 @SessionManager.register("undo")
 def undo_function(**kwargs):
+    """Usage: undo -- undoes the last command of the user"""
     argument = kwargs["argument"]
-    session:SessionManager = kwargs["session"]
+    data_client:DataClient = kwargs["data_client"]
 
     response = CommandResponse(command = "undo")
     if argument:
         response.message = 'syntax error'
         return response
-    undo_commands = session.system_data_client.server.undo()
+    undo_commands = data_client.server.undo()
     response.message = f'undid {undo_commands} elementary operations'
     response.success = True
     return response
 
 @SessionManager.register("redo")
 def redo_function(**kwargs):
+    """Usage: redo -- redoes the last undone command of the user"""
     argument = kwargs["argument"]
-    session:SessionManager = kwargs["session"]
+    data_client:DataClient = kwargs["data_client"]
 
     response = CommandResponse(command = "redo")
     if argument:
         response.message = 'syntax error'
         return response
-    redo_commands = session.system_data_client.server.redo()
+    redo_commands = data_client.server.redo()
     response.message = f'redid {redo_commands} elementary operations'
     response.success = True
     return response
+
+@SessionManager.register("cache")
+def cache_function(**kwargs):
+    """Usage: cache -- counters of the read cache, the expansion cache and the friend graph of the serving worker"""
+    argument = kwargs["argument"]
+    data_client:DataClient = kwargs["data_client"]
+
+    response = CommandResponse(command = "cache")
+    if argument:
+        response.message = 'syntax error'
+        return response
+    cache = data_client.server.cache
+    expansion_cache = data_client.server.expansion_cache
+    friend_graph = data_client.server.friend_graph
+    if cache is None and expansion_cache is None and friend_graph is None:
+        response.message = 'caches are disabled'
+        response.success = True
+        return response
+    response.output = []
+    if cache is not None:
+        response.output += [f'{k}:{v}' for k,v in cache.stats().items()]
+    if expansion_cache is not None:
+        response.output += [f'expansion_{k}:{v}' for k,v in expansion_cache.stats().items()]
+    if friend_graph is not None:
+        response.output += [f'friends_{k}:{v}' for k,v in friend_graph.stats().items()]
+    response.message = 'success'
+    response.success = True
+    return response
+
+@SessionManager.register("reindex")
+def reindex_function(**kwargs):
+    """Usage: reindex -- rebuilds the registry of names, the property index and the value index"""
+    argument = kwargs["argument"]
+    user = kwargs["user"]
+    data_client:DataClient = kwargs["data_client"]
+
+    response = CommandResponse(command = "reindex")
+    if argument:
+        response.message = 'syntax error'
+        return response
+    permitted = data_client.permissions(user, 'write')
+    if '_all' not in permitted:
+        response.message = 'not authorized'
+        return response
+    indexed_keys = data_client.server.rebuild_indexes()
+    response.message = f'indexed {indexed_keys} keys'
+    response.success = True
+    return response
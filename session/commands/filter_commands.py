@@ -26,8 +26,8 @@ def yield_function(**kwargs):
 
     argument_list=argument.split(';')
     command = argument_list.pop(0).strip()
-    argument = session.nested_replace('(' + ';'.join(argument_list) +')', token)
-    argument_list= TripletSet(argument)
+    # the output of the sub-command is taken as it is, not flattened to text
+    argument_list= TripletSet(session.nested_output(';'.join(argument_list), token) or [])
 
     try:
         response.output = data_client.transform(argument_list, command)
@@ -51,8 +51,8 @@ def filter_function(**kwargs):
 
     argument_list=argument.split(';')
     command = argument_list.pop(0).strip()
-    argument = session.nested_replace('(' + ';'.join(argument_list) +')', token)
-    argument_list= TripletSet(argument)
+    # the output of the sub-command is taken as it is, not flattened to text
+    argument_list= TripletSet(session.nested_output(';'.join(argument_list), token) or [])
 
     try:
         response.output = data_client.filter(argument_list, command)
@@ -77,9 +77,8 @@ def choose_function(**kwargs):
     argument_list=argument.split(';')
     format = argument_list.pop(0)
     choose = ['name' in format, 'property' in format, 'value' in format]
-    argument = session.nested_replace('(' + ';'.join(argument_list) +')', token)
     res = {}
-    for u in TripletSet(argument):
+    for u in TripletSet(session.nested_output(';'.join(argument_list), token) or []):
         res.update(dict.fromkeys(np.array(u.data)[choose]))
     response.output= list(res.keys())
     response.message += "success"
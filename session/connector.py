@@ -7,99 +7,274 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.utilities import *
+from session.scripts import SCRIPTS
+from session.steps import run
+from session import connector_logic
+from session.read_cache import shared_read_cache, shared_expansion_cache, shared_friend_graph
+from session.undo_log import UndoLog
+from session.command_plan import count_reads
 from configs.logging_config import setup_logger
 logger = setup_logger(__file__)
 
 from configs.settings import settings
 
 class DatabaseConnector:
-    def __init__(self):
-        self.client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-        self.undo_buffer = UndoBuffer(maxlen=settings.undo_list_length)
+    """
+        The storage layer of DataClient. Its logic is written once for it and AsyncDatabaseConnector
+        in session/connector_logic.py, this class runs the Redis I/O.
+        - *owner*: the user whose undo log registers the writes
+    """
+    def __init__(self, owner='system'):
+        self.client = redis.Redis(connection_pool=settings.connection_pool)
+        self.undo_log = UndoLog(owner)
+        # the elementary writes are server-side scripts: one atomic round trip each
+        self.scripts = { name:self.client.register_script(source) for name, source in SCRIPTS.items() }
+        self.cache = shared_read_cache()
+        self.expansion_cache = shared_expansion_cache()
+        self.friend_graph = shared_friend_graph()
 
+    def reset(self, owner='system'):
+        """Hands the connector over to owner: its writes go to the undo log of owner."""
+        self.undo_log = UndoLog(owner)
+
+    def _call(self, method, *args):
+        """The I/O of the steps of session/connector_logic.py."""
+        if method == 'script':
+            name, keys, script_args = args
+            return self.scripts[name](keys=keys, args=script_args)
+        if method == 'pipeline':
+            commands, transaction = args
+            with self.client.pipeline(transaction=transaction) as pipe:
+                for command, *arguments in commands:
+                    if command == 'script':
+                        name, keys, script_args = arguments
+                        self.scripts[name](keys=keys, args=script_args, client=pipe)
+                    else:
+                        getattr(pipe, command)(*arguments)
+                return pipe.execute()
+        return getattr(self.client, method)(*args)
+
+    def _run(self, steps):
+        return run(steps, self._call)
+
+    def load_scripts(self):
+        """Preloads the Lua scripts, so that the first EVALSHA calls do not miss."""
+        for script in self.scripts.values():
+            self.client.script_load(script.script)
+
+    # Every key holds a native Redis list: the list order is the value order,
+    # and `position` is the list index. See utils/migrate_storage.py for
+    # converting a keyspace written with the old comma-joined strings.
     def get(self, key) ->list:
-        res = self.client.get(key)
-        if res is None:
-            return []
-        else:
-            return res.split(',')
+        return self._run(connector_logic.get(self, key))
+
+    def get_many(self, keys, batch_size=None) ->list:
+        """Value lists of all the keys, pipelined in batches of settings.PIPELINE_BATCH_SIZE."""
+        return self._run(connector_logic.get_many(self, keys, batch_size))
+
+    def script_keys(self, key) ->list:
+        return [key, settings.NAME_REGISTRY_KEY, *self.undo_log.keys]
+
+    def script_args(self, register=True) ->list:
+        return [settings.READ_CACHE_CHANNEL, *self.undo_log.script_args(register)]
 
     def set(self, key, value, position=None, unique=True, register=True):
-        if self.exists(key):
-            entry = self.get(key)
-            if unique and value in entry:
-                return 0
-            if position is None:
-                position = len(entry)
-            entry.insert(position, str(value))
-        else:
-            entry = [value]
-        if register:
-            self.undo_buffer.write(['set', key, value, position])
-        return self.client.set(key, ",".join(entry))
-    
+        return self._run(connector_logic.append(self, key, value, position, unique, register))
+
+    def set_many(self, items, register=True) ->list:
+        """
+            Unique appends of all the (key, value) items, in the given order, sent in
+            MULTI/EXEC pipelines of settings.PIPELINE_BATCH_SIZE writes.
+            Returns: list of positions, -1 for the values already present
+        """
+        return self._run(connector_logic.set_many(self, items, register))
+
     def delete(self, key, value=None, register=True):
-        if value is None:
-            deleted_entries=0
-            for value in self.get(key):
-                deleted_entries += self._delete(key, value, register)
-            return deleted_entries
-        return self._delete(key, value, register)
-
-    def _delete(self, key, value, register=True):
-        try:
-            entry = self.get(key)
-            index = entry.index(value)
-            del entry[index]
-            if register:
-                self.undo_buffer.write(['delete', key, value, index])
-            if entry:
-                self.client.set(key, ",".join(entry))
-            else:
-                self.client.delete(key)
-            return 1
-        except ValueError:
-            return 0            
+        return self._run(connector_logic.delete(self, key, value, register))
+
+    def invalidate(self, key=None):
+        """Evicts key, everything if key is None, from the in-process caches at once."""
+        for cache in (self.cache, self.expansion_cache, self.friend_graph):
+            if cache is not None:
+                cache.invalidate(key)
 
     def start_command(self, message='command'):
-        if self.undo_buffer.peek() is not None and self.undo_buffer.peek()[0] != 'start':
-            self.undo_buffer.write(['start', message])
+        self.undo_log.start_group(message)
+
+    def command_group(self, message='command'):
+        """Context manager: the writes of the block form a single undo group."""
+        return self.undo_log.command_group(message)
 
     def undo(self, until_start=True):
-        number_of_undo_operations=0
-        while True:
-            undo_entry = self.undo_buffer.undo()
-            if undo_entry is None or undo_entry[0] == 'start':
-                return number_of_undo_operations
-            command, key, value, position = undo_entry
-            if command == 'set':
-                number_of_undo_operations += self.delete(key, value, register=False)
-            if command == 'delete':
-                number_of_undo_operations += self.set(key, value, position, register=False)
-            if not until_start:
-                break
-        return number_of_undo_operations
+        """Undoes the last group of the undo log (the last operation if not until_start)."""
+        return self._replay(self.undo_log.undo_key, self.undo_log.redo_key, backward=True, whole_group=until_start)
+
+    def rollback(self, group):
+        """Undoes the group with the id group, without keeping it for redo."""
+        return self._replay(self.undo_log.undo_key, None, backward=True, group=group)
+
+    def group_size(self, group) ->int:
+        """Number of elementary operations of the group with the id group in the undo log."""
+        return self.client.xlen(self.undo_log.entries_key(self.undo_log.undo_key, group))
 
     def redo(self, until_start=True):
-        number_of_redo_operations=0
+        """Redoes the last undone group (the last undone operation if not until_start)."""
+        return self._replay(self.undo_log.redo_key, self.undo_log.undo_key, backward=False, whole_group=until_start)
+
+    def _replay(self, source, target, backward, whole_group=True, group=None):
+        """
+            Replays a group of the source list and moves it to the target list (drops it if target is
+            None), in a single MULTI/EXEC transaction; the source list and the entries of the group are
+            watched, so a concurrent write or undo of the same user restarts the replay.
+            - *group*: the id of the group, the last group of the source list if None
+            Returns: number of replayed elementary operations
+        """
         while True:
-            redo_entry = self.undo_buffer.redo()
-            if redo_entry is None or redo_entry[0] == 'start':
-                return number_of_redo_operations
-            command, key, value, position = redo_entry
-            if command == 'set':
-                number_of_redo_operations += self.set(key, value, position, register=False)
-            if command == 'delete':
-                number_of_redo_operations += self.delete(key, value, register=False)
-            if not until_start:
-                break
-        return number_of_redo_operations
+            with self.client.pipeline(transaction=True) as pipe:
+                try:
+                    pipe.watch(source)
+                    replayed = group if group is not None else pipe.lindex(source, -1)
+                    if replayed is None or pipe.lpos(source, replayed) is None:
+                        return 0
+                    stream = self.undo_log.entries_key(source, replayed)
+                    pipe.watch(stream)
+                    entries = self.undo_log.group_entries(pipe, stream, whole_group)    # newest first
+                    emptied = whole_group or pipe.xlen(stream) <= len(entries)
+                    pipe.multi()
+                    operations = entries if backward else entries[::-1]
+                    for _, fields in operations:
+                        key, value = fields['key'], fields['value']
+                        if (fields['op'] == 'set') != backward:
+                            self.scripts['insert_at'](keys=self.script_keys(key),
+                                args=self.script_args(register=False) + [value, fields['position'], 1], client=pipe)
+                        else:
+                            self.scripts['remove_value'](keys=self.script_keys(key),
+                                args=self.script_args(register=False) + [value], client=pipe)
+                    if emptied:
+                        pipe.delete(stream)
+                        pipe.lrem(source, 0, replayed)
+                    else:
+                        pipe.xdel(stream, entries[0][0])
+                    if target is not None:
+                        for _, fields in entries[::-1]:
+                            pipe.xadd(self.undo_log.entries_key(target, replayed), fields)
+                        pipe.lrem(target, 0, replayed)
+                        pipe.rpush(target, replayed)
+                    results = pipe.execute()
+                except redis.WatchError:
+                    continue
+            for _, fields in entries:
+                self.invalidate(fields['key'])
+            return sum(1 for r in results[:len(operations)] if r >= 0)
+
+    def friend_entries(self, names) ->dict:
+        """
+            The memberships and friendships of the names, through the friend graph.
+            Returns: dict name -> (modules of name:_belongs_to, names of name:_friend)
+        """
+        return self._run(connector_logic.friend_entries(self, names))
 
     def exists(self, key):
+        count_reads(1)
         return self.client.exists(key)
+
+    def exists_many(self, keys) ->list:
+        """Existence of all the keys, pipelined in batches of settings.PIPELINE_BATCH_SIZE."""
+        return self._run(connector_logic.exists_many(self, keys))
     
     def keys(self, pattern='*'):
-        return self.client.keys(pattern)
+        """Incremental SCAN over the keyspace, it does not block the server like KEYS."""
+        return self.client.scan_iter(match=pattern, count=settings.PIPELINE_BATCH_SIZE)
+
+    def names(self) ->set:
+        """All the names (keys without ':'), read from the registry kept by the write scripts."""
+        count_reads(1)
+        return self.client.smembers(settings.NAME_REGISTRY_KEY)
+
+    def index_members(self, prefix, entries) ->list:
+        """Members of the index sets prefix + entry of all the entries, pipelined."""
+        return self._run(connector_logic.index_members(self, prefix, entries))
+
+    def value_holders(self, values) ->list:
+        """The name:property keys holding each of the values, read from the inverted value index."""
+        return self.index_members(settings.VALUE_INDEX_PREFIX, values)
+
+    def property_holders(self, properties) ->list:
+        """The names having each of the properties, read from the property index."""
+        return self.index_members(settings.PROPERTY_INDEX_PREFIX, properties)
+
+    def index_statistics(self, property_list, value_list, permitted) ->dict:
+        """
+            Cardinalities for the query planner, in one round trip: number of names, holders of
+            the explicit properties and values, members of the permitted modules.
+        """
+        return self._run(connector_logic.index_statistics(self, property_list, value_list, permitted))
+
+    def session_ttl(self, username):
+        """Remaining seconds of the session key of username, None if there is none."""
+        count_reads(1)
+        ms = self.client.pttl(f'{settings.SESSION_PREFIX}{username}')
+        if ms == -2:
+            return None
+        return float('inf') if ms == -1 else ms/1000
+
+    def start_session(self, username, seconds):
+        """Sets the session key of username to expire in seconds; seconds <= 0 removes it."""
+        key = f'{settings.SESSION_PREFIX}{username}'
+        if seconds <= 0:
+            self.client.delete(key)
+        else:
+            self.client.set(key, username, px=max(1, int(1000*seconds)))
+
+    def refresh_session(self, username, seconds) ->bool:
+        """Pushes the expiry of the session key of username; False if the session is over."""
+        return bool(self.client.pexpire(f'{settings.SESSION_PREFIX}{username}', max(1, int(1000*seconds))))
+
+    def membership_versions(self, fields) ->list:
+        """The stamps of the cached permissions for the modules and users in fields, see session/permissions.py."""
+        count_reads(1)
+        return self.client.hmget(settings.MEMBERSHIP_VERSIONS_KEY, fields) if fields else []
+
+    def reset_membership_version(self):
+        """A fresh stamp of every module and user, for the writes that bypass the scripts (flush, reindexing)."""
+        self.client.hset(settings.MEMBERSHIP_VERSIONS_KEY, '*', time.time_ns())
+
+    def index_version(self):
+        version = self.client.get(settings.INDEX_VERSION_KEY)
+        return None if version is None else int(version)
+
+    def rebuild_indexes(self):
+        """
+            Rebuilds the registry of names, the property index and the inverted value index
+            by scanning the keyspace. Writes running meanwhile may be missed, so call it on a quiet database.
+            Returns: number of indexed keys
+        """
+        pipe = self.client.pipeline(transaction=False)
+        def flush(force=False):
+            if force or len(pipe) >= settings.PIPELINE_BATCH_SIZE:
+                pipe.execute()
+        pipe.delete(settings.NAME_REGISTRY_KEY)
+        for prefix in [settings.VALUE_INDEX_PREFIX, settings.PROPERTY_INDEX_PREFIX]:
+            for key in self.keys(f'{prefix}*'):
+                pipe.delete(key)
+                flush()
+        flush(force=True)
+        keys = list(self.client.scan_iter(count=settings.PIPELINE_BATCH_SIZE, _type='list'))
+        for start in range(0, len(keys), settings.PIPELINE_BATCH_SIZE):
+            batch = keys[start:start+settings.PIPELINE_BATCH_SIZE]
+            for key, values in zip(batch, self.get_many(batch)):
+                if ':' in key:
+                    prefix = settings.VALUE_INDEX_PREFIX
+                else:
+                    prefix = settings.PROPERTY_INDEX_PREFIX
+                    pipe.sadd(settings.NAME_REGISTRY_KEY, key)
+                for value in values:
+                    pipe.sadd(f'{prefix}{value}', key)
+                flush()
+        pipe.set(settings.INDEX_VERSION_KEY, settings.INDEX_VERSION)
+        flush(force=True)
+        self.reset_membership_version()
+        return len(keys)
     
     def check(self):
         try:
@@ -109,7 +284,11 @@ class DatabaseConnector:
             return False
     
     def delete_all(self):
-        return self.client.flushdb()
+        result = self.client.flushdb()
+        self.reset_membership_version()
+        self.client.publish(settings.READ_CACHE_CHANNEL, '*')
+        self.invalidate()
+        return result
     
     def raw(self, pattern='*'):
-        return { x:self.client.get(x) for x in self.client.keys(pattern) }
+        return { x:self.get(x) for x in self.client.scan_iter(match=pattern, _type='list') }
@@ -0,0 +1,147 @@
+# The storage logic of DatabaseConnector and AsyncDatabaseConnector, as steps (see session/steps.py).
+# A request is a Redis command (method, *args) of the connector client, or one of:
+# - ('script', name, keys, args): the Lua script name of session/scripts.py
+# - ('pipeline', commands, transaction): the commands, scripts included, in one pipeline
+# Every function takes the connector, for its caches and undo log; the key reads are counted
+# in the running ExecutionContext (count_reads).
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from configs.settings import settings
+from session.command_plan import count_reads
+
+def get(server, key):
+    count_reads(1)
+    if server.cache is None:
+        return (yield 'lrange', key, 0, -1)
+    values = server.cache.lookup(key)
+    if values is None:
+        generation = server.cache.generation
+        values = yield 'lrange', key, 0, -1
+        server.cache.store(key, values, generation)
+    return values
+
+def get_many(server, keys, batch_size=None):
+    """Value lists of all the keys, pipelined in batches of settings.PIPELINE_BATCH_SIZE."""
+    batch_size = batch_size or settings.PIPELINE_BATCH_SIZE
+    count_reads(len(keys))
+    result = [None] * len(keys)
+    if server.cache is not None:
+        generation = server.cache.generation
+        result = [server.cache.lookup(key) for key in keys]
+    missing = [i for i, values in enumerate(result) if values is None]
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start+batch_size]
+        for i, values in zip(batch, (yield 'pipeline', [('lrange', keys[i], 0, -1) for i in batch], False)):
+            result[i] = values
+            if server.cache is not None:
+                server.cache.store(keys[i], values, generation)
+    return result
+
+def append(server, key, value, position=None, unique=True, register=True):
+    value = str(value)
+    if position is None and unique:
+        position = yield 'script', 'unique_append', server.script_keys(key), server.script_args(register) + [value]
+    else:
+        position = yield 'script', 'insert_at', server.script_keys(key), \
+            server.script_args(register) + [value, '' if position is None else position, int(unique)]
+    if position < 0:
+        return 0
+    server.invalidate(key)
+    return 1
+
+def set_many(server, items, register=True):
+    """
+        Unique appends of all the (key, value) items, in the given order, sent in
+        MULTI/EXEC pipelines of settings.PIPELINE_BATCH_SIZE writes.
+        Returns: list of positions, -1 for the values already present
+    """
+    results = []
+    for start in range(0, len(items), settings.PIPELINE_BATCH_SIZE):
+        chunk = items[start:start+settings.PIPELINE_BATCH_SIZE]
+        results.extend((yield 'pipeline', [('script', 'unique_append', server.script_keys(key),
+                                            server.script_args(register) + [str(value)]) for key, value in chunk], True))
+        for key in dict.fromkeys(key for key, _ in chunk):
+            server.invalidate(key)
+    return results
+
+def delete(server, key, value=None, register=True):
+    if value is not None:
+        return (yield from _delete(server, key, value, register))
+    deleted_entries = 0
+    for value in (yield from get(server, key)):
+        deleted_entries += yield from _delete(server, key, value, register)
+    return deleted_entries
+
+def _delete(server, key, value, register=True):
+    index = yield 'script', 'remove_value', server.script_keys(key), server.script_args(register) + [value]
+    if index < 0:
+        return 0
+    server.invalidate(key)
+    return 1
+
+def friend_entries(server, names):
+    """
+        The memberships and friendships of the names, through the friend graph.
+        Returns: dict name -> (modules of name:_belongs_to, names of name:_friend)
+    """
+    entries = {}
+    graph = server.friend_graph
+    missing = []
+    for name in dict.fromkeys(names):
+        entry = None if graph is None else graph.lookup(name)
+        if entry is None:
+            missing.append(name)
+        else:
+            entries[name] = entry
+    if missing:
+        generation = None if graph is None else graph.generation
+        lists = yield from get_many(server, [f'{n}:{p}' for n in missing for p in ('_belongs_to', '_friend')])
+        for i, name in enumerate(missing):
+            modules, friends = frozenset(lists[2*i]), frozenset(lists[2*i+1])
+            entries[name] = (modules, friends)
+            if graph is not None:
+                graph.store(name, modules, friends, generation)
+    return entries
+
+def exists_many(server, keys):
+    """Existence of all the keys, pipelined in batches of settings.PIPELINE_BATCH_SIZE."""
+    count_reads(len(keys))
+    result = []
+    for start in range(0, len(keys), settings.PIPELINE_BATCH_SIZE):
+        counts = yield 'pipeline', [('exists', key) for key in keys[start:start+settings.PIPELINE_BATCH_SIZE]], False
+        result.extend(bool(n) for n in counts)
+    return result
+
+def index_members(server, prefix, entries):
+    """Members of the index sets prefix + entry of all the entries, pipelined."""
+    count_reads(len(entries))
+    result = []
+    for start in range(0, len(entries), settings.PIPELINE_BATCH_SIZE):
+        result.extend((yield 'pipeline', [('smembers', f'{prefix}{entry}')
+                                          for entry in entries[start:start+settings.PIPELINE_BATCH_SIZE]], False))
+    return result
+
+def index_statistics(server, property_list, value_list, permitted):
+    """
+        Cardinalities for the query planner, in one round trip: number of names, holders of
+        the explicit properties and values, holders of the permitted modules as a value.
+    """
+    properties = [p for p in property_list if p != '*']
+    values = [v for v in value_list if v != '*']
+    modules = [m for m in permitted if m != '_all']
+    count_reads(1 + len(properties) + len(values) + len(modules))
+    commands = [('scard', settings.NAME_REGISTRY_KEY)]
+    commands += [('scard', f'{settings.PROPERTY_INDEX_PREFIX}{p}') for p in properties]
+    commands += [('scard', f'{settings.VALUE_INDEX_PREFIX}{v}') for v in values]
+    commands += [('scard', f'{settings.VALUE_INDEX_PREFIX}{m}') for m in modules]
+    counts = yield 'pipeline', commands, False
+    names, counts = counts[0], counts[1:]
+    return {
+        'names': names,
+        'properties': dict(zip(properties, counts[:len(properties)])),
+        'values': dict(zip(values, counts[len(properties):len(properties)+len(values)])),
+        'modules': dict(zip(modules, counts[len(properties)+len(values):])),
+    }
@@ -0,0 +1,119 @@
+import ast
+import time
+import numpy as np
+
+# The variables bound for every triplet: name, property, value and triplet ('name:property:value').
+FIELDS = ('name', 'property', 'value')
+
+_COMPARISONS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+def _constant(node):
+    """The numeric value of a (signed) numeric literal, None for any other node."""
+    sign = 1
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        sign = -1 if isinstance(node.op, ast.USub) else 1
+        node = node.operand
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return sign*node.value
+    return None
+
+def _field(node):
+    """The field of float(name), float(property) or float(value), None for any other node."""
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'float'
+            and len(node.args) == 1 and not node.keywords
+            and isinstance(node.args[0], ast.Name) and node.args[0].id in FIELDS):
+        return node.args[0].id
+    return None
+
+def numeric_comparison(tree):
+    """
+        The operands and the numpy operators of an expression like 'float(value) > 3' or
+        '0 <= float(value) < 10': a comparison, possibly chained, of float(field) and numeric literals.
+        Returns: (operands, operators) with the operands fields or numbers, None for any other expression
+    """
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Expr):
+        return None
+    node = tree.body[0].value
+    if not isinstance(node, ast.Compare):
+        return None
+    operands = []
+    for operand in [node.left, *node.comparators]:
+        field, number = _field(operand), _constant(operand)
+        if field is None and number is None:
+            return None
+        operands.append(number if field is None else field)
+    if not any(operand in FIELDS for operand in operands):
+        return None
+    operators = [_COMPARISONS.get(type(op)) for op in node.ops]
+    if None in operators:
+        return None
+    return operands, operators
+
+class Expression:
+    """
+        A filter or yield expression, parsed once by the asteval interpreter of a DataClient
+        and evaluated with name, property, value and triplet bound as variables.
+        A comparison of float(field) with numbers is evaluated at once over all the triplets with numpy.
+        - *interpreter*: the asteval Interpreter
+        - *command*: the text of the expression
+    """
+    def __init__(self, interpreter, command):
+        self.interpreter = interpreter
+        self.command = command
+        interpreter.error = []
+        try:
+            self.tree = interpreter.parse(command)
+        except Exception:
+            raise self.error()
+        self.comparison = numeric_comparison(self.tree)
+
+    def __call__(self, name, property, value):
+        interpreter = self.interpreter
+        interpreter.symtable.update(name=name, property=property, value=value, triplet=f'{name}:{property}:{value}')
+        interpreter.error = []
+        interpreter.start_time = time.time()
+        try:
+            return interpreter.run(self.tree, with_raise=True)
+        except Exception:
+            raise self.error()
+
+    def error(self) ->ValueError:
+        """The last error of the interpreter, as raised by filter and yield."""
+        errors = self.interpreter.error
+        message = f'{errors[-1].exc.__name__}: {errors[-1].msg}' if errors else self.interpreter.error_msg
+        return ValueError(f"Error in command '{self.command}': {message}")
+
+    def vectorized(self, triplets):
+        """
+            The result of the comparison for every triplet as a boolean array,
+            None if the expression is not a numeric comparison or a field is not a number.
+        """
+        if self.comparison is None:
+            return None
+        operands, operators = self.comparison
+        columns = dict(zip(FIELDS, zip(*triplets))) if triplets else dict.fromkeys(FIELDS, ())
+        try:
+            values = [np.fromiter(map(float, columns[x]), dtype=float, count=len(triplets)) if x in FIELDS else x
+                      for x in operands]
+        except ValueError:
+            # the evaluation triplet by triplet reports the error
+            return None
+        result = np.ones(len(triplets), dtype=bool)
+        for left, operator, right in zip(values, operators, values[1:]):
+            result &= operator(left, right)
+        return result
+
+    def filter(self, triplets) ->list:
+        """The triplets for which the expression is true."""
+        triplets = list(triplets)
+        chosen = self.vectorized(triplets)
+        if chosen is not None:
+            return [t for t, keep in zip(triplets, chosen) if keep]
+        return [t for t in triplets if self(*t)]
@@ -3,6 +3,11 @@ import secrets
 from passlib.context import CryptContext
 from datetime import datetime
 import time
+import threading
+import asyncio
+import contextvars
+from contextlib import nullcontext, closing
+from concurrent.futures import ThreadPoolExecutor
 
 import re
 from configs.response_model import CommandResponse
@@ -14,12 +19,23 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from utils.utilities import *
 from utils.triplets import *
 from session.client import DataClient
+from session.async_client import AsyncDataClient
+from session.session_table import SessionTable
+from session.client_pool import ClientPool
+from session.command_plan import CommandParser, ExecutionContext, command_context, current_context
+from session.steps import run, arun, method_caller
+from session import client_logic
+from configs.settings import settings
 
 from configs.logging_config import setup_logger
 logger = setup_logger(__file__)
 
 class SessionManager:
     dispatch_table = {}
+    # coroutine handlers awaited by acommand; commands missing here run their sync handler in a thread
+    async_dispatch_table = {}
+    # async generator handlers used by astream; commands missing here stream the output of acommand
+    stream_dispatch_table = {}
 
     @classmethod
     def register(cls, *names):
@@ -30,9 +46,43 @@ class SessionManager:
             return func
         return decorator
 
+    @classmethod
+    def register_async(cls, *names):
+        def decorator(func):
+            actual_names = names or [func.__name__]
+            for key in actual_names:
+                cls.async_dispatch_table[key] = func
+            return func
+        return decorator
+
+    @classmethod
+    def register_stream(cls, *names):
+        def decorator(func):
+            actual_names = names or [func.__name__]
+            for key in actual_names:
+                cls.stream_dispatch_table[key] = func
+            return func
+        return decorator
+
     def __init__(self):
         self.system_data_client= DataClient()
         self.login_data = {"system": self.system_data_client}
+        self.async_system_data_client = AsyncDataClient()
+        self.async_login_data = {"system": self.async_system_data_client}
+        # validated tokens, see get_user_by_token
+        self.sessions = SessionTable()
+        # command texts parsed into plan trees, see command
+        self.parser = CommandParser(self.split_command)
+        # the clients lent to the logged-in users, see login
+        self.clients = ClientPool()
+        self._login_lock = threading.Lock()
+        # the parallel sub-commands of the sync commands, see run_subcommands
+        self.subcommand_pool = ThreadPoolExecutor(max_workers=settings.SUBCOMMAND_THREADS, thread_name_prefix='subcommand')
+
+        # databases written before the current indices existed
+        if self.system_data_client.server.index_version() != settings.INDEX_VERSION:
+            indexed = self.system_data_client.server.rebuild_indexes()
+            logger.info(f'install: indexed {indexed} keys')
 
         # check the necessary header of the database; create if not present
         if not '_system' in self.system_data_client:
@@ -64,15 +114,19 @@ class SessionManager:
         self.default_expiration_time_delta = 15*60   #15 minutes
 
     def start(self):
+        self.system_data_client.server.load_scripts()
         self.system_data_client.new(name='system_info', module='_system')
         self.system_data_client.new(name='built_in_functions', module='system_info')
         for k,v in SessionManager.dispatch_table.items():
             value = v.__doc__ if v.__doc__ else "No documentation available"
             self.system_data_client.set(f"built_in_functions:{k}:{value}")
+        self.clients.warm()
         logger.info("Starting SessionManager")
     
     def stop(self):
         logger.info("Stopping SessionManager")
+        self.subcommand_pool.shutdown(wait=False, cancel_futures=True)
+        settings.connection_pool.disconnect()
     
     def decode_access_token(self, token: str):
         try:
@@ -85,21 +139,72 @@ class SessionManager:
             return None
 
     def user_expiration_dt(self, username, dt=None):
-        if not self.system_data_client.in_module(username, 'users'):
+        """
+            Remaining seconds of the session of username; with dt, starts it anew for dt seconds
+            and returns the new expiration time.
+            The session lives in a key with a native TTL (settings.SESSION_PREFIX); the expires triplet
+            records the expiration and stands for the key when there is none ('_infinity' never expires).
+        """
+        return run(self._expiration_steps(username, dt), method_caller(self.system_data_client.server))
+
+    async def auser_expiration_dt(self, username, dt=None):
+        """Awaitable variant of user_expiration_dt."""
+        return await arun(self._expiration_steps(username, dt), method_caller(self.async_system_data_client.server))
+
+    def _expiration_steps(self, username, dt=None):
+        """user_expiration_dt as steps on the system connector (see session/steps.py)."""
+        if 'users' not in (yield 'get', f'{username}:_belongs_to'):
             logger.error(f'user {username} is not registered')
             return None
-        expiration = self.system_data_client.simple_get([username],['expires'],['*']).format('value')
+        if dt is None:
+            remaining = yield 'session_ttl', username
+            if remaining is not None:
+                return remaining
+        expiration = (yield from client_logic.simple_get([username],['expires'],['*'])).format('value')
         if '_infinity' in expiration:
             return 1
         if dt is None:
             try:
-                return float(expiration[0])-datetime.now().timestamp()
+                remaining = float(expiration[0])-datetime.now().timestamp()
             except:
                 return 0
-        self.system_data_client.delete(f'{username}:expires')
+            # a session started before the session keys
+            if remaining > 0:
+                yield 'start_session', username, remaining
+            return remaining
         newtime = datetime.now().timestamp()+dt
-        self.system_data_client.set(f'{username}:expires:{str(newtime)}')   
-        return newtime     
+        yield 'start_session', username, dt
+        yield from self._write_expiration(username, newtime, expiration)
+        return newtime
+
+    @staticmethod
+    def _write_expiration(username, newtime, expiration):
+        # the new expiration is written before the old ones are removed: a concurrent check
+        # never finds the list empty; the session bookkeeping is not registered for undo
+        yield 'set_many', [(username, 'expires'), (f'{username}:expires', str(newtime))], False
+        for old in expiration:
+            if old != str(newtime):
+                yield 'delete', f'{username}:expires', old, False
+
+    def touch_session(self, user, token):
+        """
+            Slides the expiry of the session of user forward by default_expiration_time_delta,
+            at most every settings.SESSION_REFRESH_INTERVAL seconds per token.
+        """
+        run(self._touch_steps(user, token), method_caller(self.system_data_client.server))
+
+    async def atouch_session(self, user, token):
+        """Awaitable variant of touch_session."""
+        await arun(self._touch_steps(user, token), method_caller(self.async_system_data_client.server))
+
+    def _touch_steps(self, user, token):
+        """touch_session as steps on the system connector."""
+        if not self.sessions.due_for_refresh(token):
+            return
+        # no session key: an '_infinity' session, or one that just ended and fails its next validation
+        if (yield 'refresh_session', user, self.default_expiration_time_delta):
+            expiration = (yield from client_logic.simple_get([user],['expires'],['*'])).format('value')
+            yield from self._write_expiration(user, datetime.now().timestamp()+self.default_expiration_time_delta, expiration)
 
     def login(self, username: str, password: str, edit_mode: bool = False):
         """
@@ -114,7 +219,10 @@ class SessionManager:
             return None
         self.user_expiration_dt(username, self.default_expiration_time_delta)
         logger.info(f"SessionManager login: user {username} logged in")
-        self.login_data[username] = DataClient()
+        # the sessions of a user share its clients; a new user borrows a pre-warmed pair
+        with self._login_lock:
+            if username not in self.login_data or username not in self.async_login_data:
+                self.login_data[username], self.async_login_data[username] = self.clients.acquire(username)
         access_data = {
             "sub": username
         }
@@ -124,16 +232,32 @@ class SessionManager:
         return {"access_token": access_token, "token_type": "Bearer"}
 
     def get_user_by_token(self, token: str):
+        """
+            The user of token; the validation is kept in the session table for settings.SESSION_CACHE_TTL seconds.
+        """
+        return run(self._user_steps(token), method_caller(self.system_data_client.server))
+
+    async def aget_user_by_token(self, token: str):
+        """Awaitable variant of get_user_by_token."""
+        return await arun(self._user_steps(token), method_caller(self.async_system_data_client.server))
+
+    def _user_steps(self, token):
+        """get_user_by_token as steps on the system connector."""
+        user = self.sessions.lookup(token)
+        if user is not None:
+            return user
         payload = self.decode_access_token(token)
         if payload is None:
             return None
         username = payload.get("sub")
-        if not self.system_data_client.in_module(username,'users'):
+        if 'users' not in (yield 'get', f'{username}:_belongs_to'):
             logger.error(f"get_user_by_token: unknown user")
             return None
-        if self.user_expiration_dt(username) <=0:
+        remaining = yield from self._expiration_steps(username)
+        if remaining <=0:
             logger.warning(f'get_user_by_token: token expired for user "{username}", please log in again')
             return None
+        self.sessions.store(token, username, remaining)
         return username
 
     def logout(self, token: str):
@@ -145,41 +269,163 @@ class SessionManager:
             logger.info(f"SessionManager logout: user {username} is not logged in")
             return {"message": f'{username} is not logged in'}
         self.user_expiration_dt(username, dt=0)  # Set expiration time to 0 to invalidate the session
+        self.sessions.discard(user=username)
         logger.info(f"SessionManager logout: user {username} logged out")
-        del self.login_data[username]  # Remove user session data
+        with self._login_lock:
+            # Remove user session data, the clients go back to the pool
+            self.clients.release(self.login_data.pop(username, None), self.async_login_data.pop(username, None))
         return {"message": f'{username} logged out'}
 
-    def nested_replace(self, text, token, start_delim = r'\(', end_delim = r'\)', item_separator=';', entry_separator=':'):
-        x = [m.start() for m in re.finditer(start_delim, text)]
-        y = [m.start() for m in re.finditer(end_delim, text)]
-        if len(x) != len(y):
-            logger.error("Mismatched parentheses")
+    @staticmethod
+    def output_to_text(sub_result, item_separator=';', entry_separator=':'):
+        if sub_result is None:
+            return ''
+        if isinstance(sub_result, TripletSet):
+            sub_result = item_separator.join([entry_separator.join(u) for u in sub_result])
+        elif isinstance(sub_result, list):
+            sub_result = ','.join(sub_result)
+        return sub_result
+
+    def nested_replace(self, text, token, item_separator=';', entry_separator=':'):
+        """
+            The text with its (...) sub-commands replaced by their output, joined by the separators.
+            The sub-commands run in the authentication context of the running command.
+            Returns: the new text, None if the parentheses are mismatched
+        """
+        return run(self._nested_replace_steps(text, token, item_separator, entry_separator), method_caller(self))
+
+    async def anested_replace(self, text, token, item_separator=';', entry_separator=':'):
+        """Awaitable variant of nested_replace."""
+        return await arun(self._nested_replace_steps(text, token, item_separator, entry_separator), self._acall)
+
+    def _nested_replace_steps(self, text, token, item_separator, entry_separator):
+        """nested_replace as steps on the manager: the request runs the sub-commands."""
+        parts = self.parser.parts(text)
+        if parts is None:
             return None
-        if not x:
-            return text
-        pairs = [[x[0]]]
-        for ni in range(len(x)-1):
-            if x[ni+1] > y[ni]:
-                pairs[-1].append(y[ni])
-                pairs.append([x[ni+1]])
-        if y[-1] > x[-1]:
-            pairs[-1].append(y[-1])
+        outputs = iter((yield 'run_subcommands', [p for p in parts if not isinstance(p, str)], token))
+        return ''.join(part if isinstance(part, str)
+                       else self.output_to_text(next(outputs), item_separator, entry_separator)
+                       for part in parts)
+
+    async def _acall(self, method, *args):
+        """The call of arun on the manager: a request runs the awaitable variant of its method, 'a' + method."""
+        return await getattr(self, f'a{method}')(*args)
+
+    def nested_output(self, text, token):
+        """The output of text run as a sub-command, as it is: TripletSet, list or None."""
+        return self.run_subcommand(self.parser.parse(text), token)
+
+    def run_subcommand(self, node, token):
+        context = current_context(token)
+        if context is None:
+            return self.command(node.text, token).output
+        return self.execute(node, context).output
+
+    async def arun_subcommand(self, node, token):
+        context = current_context(token)
+        if context is None:
+            return (await self.acommand(node.text, token)).output
+        return (await self.aexecute(node, context)).output
+
+    # sub-commands that may run in parallel with their siblings: they do not write and do not
+    # use the expression interpreter of the client; choose runs the rest of its argument as a command
+    CONCURRENT_COMMANDS = {'get', 'choose'}
+
+    def concurrent(self, node) ->bool:
+        """Whether node and all its sub-commands are CONCURRENT_COMMANDS; a parse error is not, it stays in order."""
+        if node.keyword not in SessionManager.CONCURRENT_COMMANDS or node.parts is None:
+            return False
+        if node.keyword == 'choose':
+            rest = node.argument.split(';', 1)[1:]
+            return not rest or self.concurrent(self.parser.parse(rest[0]))
+        return all(self.concurrent(n) for n in node.subcommands)
+
+    def _parallel(self, nodes, context) ->bool:
+        return context is not None and len(nodes) > 1 and all(self.concurrent(n) for n in nodes)
+
+    def run_subcommands(self, nodes, token) ->list:
+        """
+            The outputs of sibling sub-commands, in their order.
+            When they are all concurrent, the first one runs in the calling thread and the others
+            in the sub-command pool, as long as the command tree has free slots (settings.SUBCOMMAND_CONCURRENCY);
+            the rest run in the calling thread too.
+        """
+        context = current_context(token)
+        if not self._parallel(nodes, context):
+            return [self.run_subcommand(node, token) for node in nodes]
+        return self._run_parallel(nodes, context, lambda node: self.run_subcommand(node, token))
+
+    def _run_parallel(self, nodes, context, run) ->list:
+        """run(node) for all the nodes, in their order, on the sub-command pool within the slots of context."""
+        futures = {}
+        for i, node in enumerate(nodes[1:], 1):
+            if context.slots.acquire(blocking=False):
+                futures[i] = self.subcommand_pool.submit(contextvars.copy_context().run, self._run_in_slot, run, node, context)
+        outputs = [None] * len(nodes)
+        for i, node in enumerate(nodes):
+            if i not in futures:
+                outputs[i] = run(node)
+        for i, future in futures.items():
+            if future.cancel():
+                # not started yet, the pool is busy: no waiting for it
+                context.slots.release()
+                outputs[i] = run(nodes[i])
+            else:
+                outputs[i] = future.result()
+        return outputs
+
+    @staticmethod
+    def _run_in_slot(run, node, context):
+        try:
+            return run(node)
+        finally:
+            context.slots.release()
+
+    async def arun_subcommands(self, nodes, token) ->list:
+        """Awaitable variant of run_subcommands, the parallel sub-commands run as asyncio tasks."""
+        context = current_context(token)
+        if not self._parallel(nodes, context):
+            return [await self.arun_subcommand(node, token) for node in nodes]
+        tasks = {}
+        for i, node in enumerate(nodes[1:], 1):
+            if context.slots.acquire(blocking=False):
+                tasks[i] = asyncio.create_task(self._arun_in_slot(node, token, context))
+        outputs = [None] * len(nodes)
+        try:
+            for i, node in enumerate(nodes):
+                if i not in tasks:
+                    outputs[i] = await self.arun_subcommand(node, token)
+        finally:
+            results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for i, result in zip(tasks, results):
+            if isinstance(result, BaseException):
+                raise result
+            outputs[i] = result
+        return outputs
+
+    async def _arun_in_slot(self, node, token, context):
+        try:
+            return await self.arun_subcommand(node, token)
+        finally:
+            context.slots.release()
+
+    @staticmethod
+    def split_command(text):
+        """
+            Splits a command text into its keyword and argument; unknown keywords mean "get".
+        """
+        text = text.strip()
+        m = re.match(r'^(\w+)\s*(.*)', text)
+        if m:
+            keyword, argument = m.groups()
         else:
-            logger.error("Mismatched parentheses")
-            return None
-        start = 0
-        newtext = ""
-        for i,pr in enumerate(pairs):
-            newtext += text[start:pr[0]]
-            sub_result = self.command(text[pr[0]+1:pr[1]], token=token).output
-            if isinstance(sub_result, TripletSet):
-                sub_result = item_separator.join([entry_separator.join(u) for u in sub_result])
-            elif isinstance(sub_result, list):
-                sub_result = ','.join(sub_result)
-            newtext += sub_result
-            start = pr[1]+1
-        newtext += text[start:]
-        return newtext
+            keyword, argument = '',text
+
+        if keyword not in SessionManager.dispatch_table:
+            argument = f'{keyword} {argument}'
+            keyword = "get"
+        return keyword, argument
 
     def command(self, text, token:str) -> CommandResponse:
         """
@@ -188,44 +434,255 @@ class SessionManager:
 
             The (...) construct in commands means sub-commands that are executed as commands,
             and the result is put back in text level for further processing.
+            The text is parsed once into a plan tree (CommandParser); the user is authenticated
+            once for the whole tree, the sub-commands run in its ExecutionContext.
 
             The output is a TripletSet.
         """
+        node = self.parser.parse(text)
+        context = current_context(token)
+        if context is not None:
+            return self.execute(node, context)
         t0 = time.time()
+        context = self.login_context(token)
+        if context is None:
+            return CommandResponse(
+                command=text,
+                message="invalid token"
+            )
+        # the writes of the command, sub-commands included, are undone together
+        with closing(context.lease), command_context(context), context.data_client.server.command_group(text):
+            response = self.execute(node, context)
+        dt = time.time() - t0
+        response.message += f' -- elapsed time: {dt:.2f} seconds'
+        return response
+
+    def login_context(self, token:str, caller='command') -> ExecutionContext|None:
+        """The ExecutionContext of a new command tree of token, None if the token is not valid."""
         user = self.get_user_by_token(token)
         if user is None:
-            logger.error("DataCommand command: invalid token")
+            logger.error(f"DataCommand {caller}: invalid token")
+            return None
+        self.touch_session(user, token)
+        lease = self.lease_clients(user)
+        if lease is None:
+            logger.error(f"DataCommand {caller}: no data client for user {user}")
+            return None
+        return ExecutionContext(user, token, lease.data_client, lease.async_data_client, lease=lease)
+
+    def lease_clients(self, user):
+        """
+            The clients of a logged-in user, held for a command until the close of the returned
+            ClientLease: a logout meanwhile does not hand them to another user. None if the user has none.
+        """
+        with self._login_lock:
+            data_client, async_data_client = self.login_data.get(user), self.async_login_data.get(user)
+            if data_client is None or async_data_client is None:
+                return None
+            return self.clients.hold(data_client, async_data_client)
+
+    def execute(self, node, context) -> CommandResponse:
+        """Runs the handler of a parsed command in the authentication context."""
+        if node.parts is None:
+            return CommandResponse(command=node.text, message="Error: mismatched parentheses")
+        return SessionManager.dispatch_table[node.keyword](
+            argument = node.argument,
+            user = context.user,
+            data_client = context.data_client,
+            token = context.token,
+            session = self)
+
+    def batch(self, texts, token:str, atomic=False) -> list:
+        """
+            Runs a list of commands of one token, authenticated once, in one ExecutionContext.
+            Consecutive set commands without sub-commands or passwords are written together
+            (DataClient.set_groups), in shared pipelines; consecutive concurrent commands (get, choose)
+            run in parallel like sibling sub-commands. Every command sees the writes of the ones before it.
+            - *atomic*: all or nothing; the first failed command stops the batch, and the writes of
+              the commands before it are undone
+            Every command is its own undo group, the coalesced sets share one; an atomic batch is a single group.
+            Returns: list of the CommandResponses, in the order of texts
+        """
+        nodes = [self.parser.parse(text) for text in texts]
+        context = self.login_context(token, 'batch')
+        if context is None:
+            return [CommandResponse(command=text, message="invalid token") for text in texts]
+        responses = []
+        with closing(context.lease), command_context(context), (context.data_client.server.command_group('batch') if atomic else nullcontext()) as group:
+            while len(responses) < len(nodes):
+                t0 = time.time()
+                start = len(responses)
+                end = start + 1
+                if self._coalescible(nodes[start]):
+                    while end < len(nodes) and self._coalescible(nodes[end]):
+                        end += 1
+                    chunk = self._batch_sets(nodes[start:end], context)
+                elif self.concurrent(nodes[start]):
+                    while end < len(nodes) and self.concurrent(nodes[end]):
+                        end += 1
+                    chunk = self._run_parallel(nodes[start:end], context, lambda node: self._batch_execute(node, context))
+                else:
+                    chunk = [self._batch_execute(nodes[start], context)]
+                dt = time.time() - t0
+                for response in chunk:
+                    response.message += f' -- elapsed time: {dt:.2f} seconds'
+                responses += chunk
+                if atomic and not all(response.success for response in chunk):
+                    break
+        failed = next((i for i, response in enumerate(responses) if not response.success), None)
+        if atomic and failed is not None:
+            written = context.data_client.server.group_size(group[0])
+            undone = context.data_client.server.rollback(group[0])
+            if undone == written:
+                logger.info(f"DataCommand batch: command {failed} failed, undid {undone} elementary operations")
+                outcome = 'rolled back'
+            else:
+                # a later write of the user changed what the batch wrote
+                logger.error(f"DataCommand batch: command {failed} failed, undid only {undone} of {written} elementary operations")
+                outcome = f'Error: incomplete rollback, undid {undone} of {written} operations'
+            for response in responses:
+                response.success = False
+                response.message += f' -- {outcome}, the batch failed at command {failed}'
+            responses += [CommandResponse(command=node.text, message=f'not executed, the batch failed at command {failed}')
+                          for node in nodes[len(responses):]]
+        return responses
+
+    def _batch_execute(self, node, context) -> CommandResponse:
+        """execute in a batch: the command is its own undo group, an exception fails the command only."""
+        try:
+            with context.data_client.server.command_group(node.text):
+                return self.execute(node, context)
+        except Exception as e:
+            logger.error(f"DataCommand batch: {e}")
+            return CommandResponse(command=node.text, message=f"Error: {str(e)}")
+
+    @staticmethod
+    def _set_triplets(argument) -> TripletSet:
+        """The triplets of the argument of a set command, once its sub-commands are replaced."""
+        return TripletSet([Triplet(x.strip()) for x in argument.split(';')])
+
+    def _coalescible(self, node) ->bool:
+        """Whether node is a set the batch may write together with its neighbours: no sub-command, no password to hash."""
+        return (node.keyword == 'set' and node.parts is not None and not node.subcommands
+                and not any('password' in property for _, property, _ in self._set_triplets(node.argument)))
+
+    def _batch_sets(self, nodes, context) ->list:
+        """The set commands of nodes at once, see batch."""
+        responses = [CommandResponse(command=node.text) for node in nodes]
+        data_client = context.data_client
+        try:
+            permitted = data_client.permissions(context.user, 'write')
+            with data_client.server.command_group(';'.join(node.text for node in nodes)):
+                added = data_client.set_groups([self._set_triplets(node.argument) for node in nodes], permitted=permitted)
+        except Exception as e:
+            logger.error(f"DataCommand batch: {e}")
+            for response in responses:
+                response.message = f"Error: {str(e)}"
+            return responses
+        for response, addednodes in zip(responses, added):
+            response.message = f"added {addednodes} entries"
+            response.success = True
+        return responses
+
+    async def acommand(self, text, token:str) -> CommandResponse:
+        """
+            Awaitable variant of command, for the API handlers.
+            The commands of async_dispatch_table run on redis.asyncio without blocking the event loop;
+            the others run their sync handler in a worker thread.
+        """
+        node = self.parser.parse(text)
+        context = current_context(token)
+        if context is not None:
+            return await self.aexecute(node, context)
+        if node.keyword not in SessionManager.async_dispatch_table:
+            return await asyncio.to_thread(self.command, text, token)
+        t0 = time.time()
+        user = await self.aget_user_by_token(token)
+        if user is None:
+            logger.error("DataCommand acommand: invalid token")
             return CommandResponse(
                 command=text,
                 message="invalid token"
             )
-        data_client = self.login_data.get(user)
-        if data_client is None:
-            logger.error(f"DataCommand command: no data client for user {user}")
+        await self.atouch_session(user, token)
+        lease = self.lease_clients(user)
+        if lease is None:
+            logger.error(f"DataCommand acommand: no data client for user {user}")
             return CommandResponse(
                 command=text,
                 message="invalid token"
             )
-        
-        self.user_expiration_dt(user, self.default_expiration_time_delta)
-        text = text.strip()
-        m = re.match(r'^(\w+)\s*(.*)', text)
-        if m:
-            keyword, argument = m.groups()
-        else:
-            keyword, argument = '',text
 
-        if keyword not in SessionManager.dispatch_table:
-            argument = f'{keyword} {argument}'
-            keyword = "get"
-        response = SessionManager.dispatch_table[keyword](
-            argument = argument,
-            user = user,
-            data_client = data_client,
-            token = token,
-            session = self)
+        context = ExecutionContext(user, token, lease.data_client, lease.async_data_client, lease=lease)
+        with closing(lease), command_context(context), lease.async_data_client.server.command_group(text):
+            response = await self.aexecute(node, context)
         dt = time.time() - t0
         response.message += f' -- elapsed time: {dt:.2f} seconds'
         return response
 
-    
+    async def aexecute(self, node, context) -> CommandResponse:
+        """Awaitable variant of execute; the commands without a coroutine handler run in a worker thread."""
+        if node.parts is None:
+            return CommandResponse(command=node.text, message="Error: mismatched parentheses")
+        if node.keyword not in SessionManager.async_dispatch_table:
+            return await asyncio.to_thread(self.execute, node, context)
+        return await SessionManager.async_dispatch_table[node.keyword](
+            argument = node.argument,
+            user = context.user,
+            data_client = context.async_data_client,
+            token = context.token,
+            session = self)
+
+    async def astream(self, text, token:str, chunk_size=None):
+        """
+            Streaming variant of acommand, for the results too large to be held at once.
+            Returns: the CommandResponse and an async iterator over the output in chunks (TripletSets or lists).
+            The commands of stream_dispatch_table read the storage chunk by chunk; the others run
+            through acommand and their output is split into chunks of chunk_size (settings.STREAM_BATCH_SIZE).
+            The message and success of the response are final once the iterator is exhausted.
+            A streamed command holds the clients of the user and its ExecutionContext from the first
+            step of the iterator to its end or its aclose, in the task iterating it.
+        """
+        chunk_size = chunk_size or settings.STREAM_BATCH_SIZE
+        keyword, argument = self.split_command(text)
+        if keyword not in SessionManager.stream_dispatch_table:
+            response = await self.acommand(text, token)
+            async def chunks():
+                output = response.output
+                if output is None:
+                    return
+                output = list(output)
+                for start in range(0, len(output), chunk_size):
+                    yield output[start:start+chunk_size]
+            return response, chunks()
+
+        response = CommandResponse(command=text)
+        async def chunks():
+            t0 = time.time()
+            user = await self.aget_user_by_token(token)
+            if user is not None:
+                await self.atouch_session(user, token)
+            # the clients are only leased once the iteration starts, and released however it ends
+            lease = None if user is None else self.lease_clients(user)
+            if lease is None:
+                logger.error("DataCommand astream: invalid token")
+                response.message = "invalid token"
+                return
+            context = ExecutionContext(user, token, lease.data_client, lease.async_data_client, lease=lease)
+            with closing(lease), command_context(context), lease.async_data_client.server.command_group(text):
+                try:
+                    async for chunk in SessionManager.stream_dispatch_table[keyword](
+                            argument = argument,
+                            user = user,
+                            data_client = lease.async_data_client,
+                            token = token,
+                            session = self,
+                            response = response):
+                        yield chunk
+                except Exception as e:
+                    logger.error(f"DataCommand astream: {e}")
+                    response.message += f"Error: {str(e)}"
+                    response.success = False
+            dt = time.time() - t0
+            response.message += f' -- elapsed time: {dt:.2f} seconds'
+        return response, chunks()
@@ -0,0 +1,87 @@
+import threading
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from session.steps import run, arun, method_caller
+
+class Permissions(list):
+    """
+        The modules a user may read or write, as listed in user:read or user:write.
+        - *modules*: the permitted modules, '_all' permits everything
+        - *names*: the names belonging to any of the modules, None if '_all' is permitted
+
+        It is a list of the modules, so it stands for the plain module lists of the
+        permitted arguments; the clients filter with the names set when it is known.
+    """
+    def __init__(self, modules, names=None):
+        super().__init__(modules)
+        self.names = names
+
+    def allows(self, name) ->bool:
+        return self.names is None or name in self.names
+
+def _build(modules, holders) ->Permissions:
+    """Permissions from the modules and the holders of the modules in the inverted value index."""
+    if '_all' in modules:
+        return Permissions(modules)
+    names = set()
+    for keys in holders:
+        for key in keys:
+            name, _, property = key.partition(':')
+            if property == '_belongs_to':
+                names.add(name)
+    return Permissions(modules, frozenset(names))
+
+class PermissionSets:
+    """
+        Process-wide cache of the permissions of the users, per user and mode ('read' or 'write').
+        Every entry is stamped with the versions of its user and of its modules, fields of the hash
+        settings.MEMBERSHIP_VERSIONS_KEY: the write scripts bump the field of a module on every change
+        of a _belongs_to list naming it, and the field of a user on every change of its read or write
+        list. A command costs one HMGET of the stamps; a membership change in another module
+        does not invalidate the entry.
+    """
+    def __init__(self):
+        self._items = {}    # (user, mode) -> (versions, Permissions)
+        self._lock = threading.Lock()
+
+    def _cached(self, user, mode):
+        with self._lock:
+            return self._items.get((user, mode))
+
+    def _store(self, user, mode, versions, permissions):
+        with self._lock:
+            self._items[(user, mode)] = (versions, permissions)
+        return permissions
+
+    def steps(self, user, mode='read'):
+        """The permissions of user, as steps on a connector (see session/steps.py)."""
+        entry = self._cached(user, mode)
+        if entry is not None and (yield 'membership_versions', _fields(user, entry[1])) == entry[0]:
+            return entry[1]
+        # the stamps are read before the lists they cover: a change meanwhile fails the next lookup
+        versions = yield 'membership_versions', _fields(user)
+        modules = yield 'get', f'{user}:{mode}'
+        versions += yield 'membership_versions', _fields(None, modules)
+        holders = [] if '_all' in modules else (yield 'value_holders', modules)
+        return self._store(user, mode, versions, _build(modules, holders))
+
+    def lookup(self, server, user, mode='read') ->Permissions:
+        """The permissions of user, read through the DatabaseConnector server."""
+        return run(self.steps(user, mode), method_caller(server))
+
+    async def alookup(self, server, user, mode='read') ->Permissions:
+        """The permissions of user, read through the AsyncDatabaseConnector server."""
+        return await arun(self.steps(user, mode), method_caller(server))
+
+def _fields(user, modules=()) ->list:
+    """The fields of the membership versions stamping the permissions of user on modules."""
+    fields = ['*', user] if user is not None else []
+    return fields + [m for m in modules if m != '_all']
+
+_permission_sets = PermissionSets()
+
+def shared_permission_sets() ->PermissionSets:
+    return _permission_sets
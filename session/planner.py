@@ -0,0 +1,98 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from session.command_plan import current_reads
+
+# Access paths of a get over all the names ('*'), in order of preference on equal cost:
+# - value_index:    the holders of the explicit values, read from the inverted value index
+# - property_index: the names having one of the explicit properties
+# - permitted_names: the names permitted to a restricted user, known from its Permissions
+# - module_members: the names whose _belongs_to list holds a permitted module, from the value index
+# - registry:       every registered name
+# A get over explicit names always takes the path 'names'.
+ACCESS_PATHS = ['value_index', 'property_index', 'permitted_names', 'module_members', 'registry']
+
+def estimate_paths(statistics, property_list, value_list, permitted) ->dict:
+    """
+        Estimated key reads of every applicable access path.
+        - *statistics*: cardinalities from DatabaseConnector.index_statistics
+        Returns: dict path -> estimated key reads, in order of preference
+    """
+    restricted = '_all' not in permitted
+    # the permitted names of a Permissions filter in memory
+    names = getattr(permitted, 'names', None)
+    def fetch(count):
+        # explicit properties: one value list per name and property;
+        # all the properties: the property list and at least one value list per name
+        if '*' in property_list:
+            return 2*count
+        return count*len(property_list)
+    def restrict(count):
+        # one _belongs_to list per name for a restricted user
+        return count if restricted and names is None else 0
+
+    estimates = {}
+    if '*' not in value_list:
+        holders = sum(statistics['values'].values())
+        estimates['value_index'] = len(value_list) + restrict(holders)
+    if '*' not in property_list:
+        holders = sum(statistics['properties'].values())
+        estimates['property_index'] = len(property_list) + restrict(holders) + fetch(holders)
+    if names is not None:
+        estimates['permitted_names'] = fetch(len(names))
+    if restricted:
+        members = sum(statistics['modules'].values())
+        estimates['module_members'] = len(permitted) + restrict(members) + fetch(members)
+    estimates['registry'] = 1 + restrict(statistics['names']) + fetch(statistics['names'])
+    return estimates
+
+@dataclass
+class GetPlan:
+    """
+        The access path of a get, with the estimated costs and the measured stages.
+        - *path*: one of ACCESS_PATHS, or 'names' for explicit names
+        - *estimates*: estimated key reads of every considered path
+        - *stages*: (stage, key reads, seconds) in execution order
+    """
+    path: str = 'names'
+    estimates: dict = field(default_factory=dict)
+    stages: list = field(default_factory=list)
+
+    def choose(self, statistics, property_list, value_list, permitted):
+        """Chooses the cheapest access path."""
+        self.estimates = estimate_paths(statistics, property_list, value_list, permitted)
+        self.path = min(self.estimates, key=self.estimates.get)
+        return self.path
+
+    @contextmanager
+    def stage(self, name):
+        """Measures the key reads of the running command tree and the time spent inside the block."""
+        reads = current_reads()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, current_reads() - reads, time.perf_counter() - start))
+
+    @property
+    def estimated_reads(self):
+        return self.estimates.get(self.path)
+
+    @property
+    def actual_reads(self) ->int:
+        return sum(reads for _, reads, _ in self.stages)
+
+    def report(self) ->list:
+        """The plan as a list of 'key:value' entries."""
+        report = [f'path:{self.path}']
+        if self.estimated_reads is not None:
+            report.append(f'estimated_reads:{self.estimated_reads}')
+        report.append(f'actual_reads:{self.actual_reads}')
+        report += [f'estimate:{path}:{reads}' for path, reads in self.estimates.items()]
+        report += [f'stage:{name}:{reads} reads:{1000*seconds:.3f} ms' for name, reads, seconds in self.stages]
+        return report
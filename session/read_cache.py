@@ -0,0 +1,276 @@
+import threading
+import time
+from collections import OrderedDict
+import redis
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from configs.settings import settings
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+class InvalidatedCache:
+    """
+        Base of the in-process caches kept in step with the writes of all the workers: an LRU map
+        whose entries the InvalidationListener evicts when the write scripts publish their keys.
+        - *max_entries*: maximal number of entries
+        - *max_size*: maximal total size of the entries, as given to store; None for no bound
+
+        affected is the invalidation hook: it maps a published key to the entry it concerns.
+        An entry may also depend on other entries' keys, given to store: a change of one of them
+        evicts it too. Every invalidation bumps the generation, and a value is not stored if its key
+        or one of its dependencies changed, or everything was cleared, after the generation it was
+        computed at. While the listener is not subscribed (start-up, lost connection) nothing is cached.
+    """
+    # the properties of the name:property keys concerning the cache, None for every key (see affected)
+    PROPERTIES = None
+
+    def __init__(self, max_entries, max_size=None):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._items = OrderedDict()     # key -> (value, size, dependencies)
+        self._dependents = {}           # key -> keys of the entries depending on it
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._changed = {}              # key -> generation of its last invalidation
+        self._cleared = 0               # generation of the last invalidation of everything
+        self.subscribed = False
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Returns: the cached value of key, None on a miss"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def store(self, key, value, generation, dependencies=(), size=1):
+        """
+            Caches the value of key, computed when the cache was at the given generation.
+            - *dependencies*: the keys of the other entries the value depends on
+            Returns: whether the value is stored
+        """
+        dependencies = frozenset(dependencies) - {key}
+        with self._lock:
+            if (not self.subscribed or self._cleared > generation
+                    or any(self._changed.get(k, 0) > generation for k in (key, *dependencies))
+                    or (self.max_size is not None and size > self.max_size)):
+                return False
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (value, size, dependencies)
+            self.size += size
+            for dependency in dependencies:
+                self._dependents.setdefault(dependency, set()).add(key)
+            while len(self._items) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+            return True
+
+    def _drop(self, key):
+        _, size, dependencies = self._items.pop(key)
+        self.size -= size
+        for dependency in dependencies:
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._dependents[dependency]
+
+    def affected(self, key):
+        """The entry key concerned by the published key, None if none: the key itself, or its name for PROPERTIES."""
+        if self.PROPERTIES is None:
+            return key
+        name, _, property = key.partition(':')
+        return name if property in self.PROPERTIES else None
+
+    def invalidate(self, key=None):
+        """Evicts the entry concerned by key and the entries depending on it, everything if key is None."""
+        if key is not None:
+            key = self.affected(key)
+            if key is None:
+                return
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if key is None or len(self._changed) >= self.max_entries:
+                # the change marks are bounded: forgetting them refuses every running computation
+                self._changed.clear()
+                self._cleared = self.generation
+            if key is None:
+                self._items.clear()
+                self._dependents.clear()
+                self.size = 0
+                return
+            self._changed[key] = self.generation
+            for stale in [key, *self._dependents.get(key, ())]:
+                if stale in self._items:
+                    self._drop(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {'entries': len(self._items)}
+            if self.max_size is not None:
+                stats['size'] = self.size
+            stats.update(hits=self.hits, misses=self.misses, evictions=self.evictions, invalidations=self.invalidations)
+            return stats
+
+    def set_subscribed(self, subscribed):
+        with self._lock:
+            self.subscribed = subscribed
+
+class ReadCache(InvalidatedCache):
+    """
+        In-process LRU cache of the value lists read by the connectors.
+        - *max_entries*: maximal number of cached keys
+        - *max_size*: maximal number of cached characters (keys and values)
+        - *channel*: the invalidation channel the write scripts publish the changed keys on
+
+        Every written key evicts its own entry.
+    """
+    def __init__(self, max_entries, max_size, channel):
+        super().__init__(max_entries, max_size)
+        self.channel = channel
+
+    def lookup(self, key):
+        """Returns: the cached value list of key, None on a miss"""
+        values = super().lookup(key)
+        return None if values is None else list(values)
+
+    def store(self, key, values, generation):
+        """Caches values of key, read when the cache was at the given generation."""
+        return super().store(key, tuple(values), generation, size=len(key) + sum(len(v) for v in values))
+
+class ExpansionCache(InvalidatedCache):
+    """
+        In-process memo of the name expansion of DataClient.get: for every name, the values of
+        the _alias and _member lists reachable from it (see DataClient.expand).
+        - *max_entries*: maximal number of cached names
+
+        Every entry depends on the names its expansion met, and a change of the _alias, _member
+        or _header list of one of them evicts it. Other writes leave the entries alone.
+    """
+    PROPERTIES = ('_alias', '_member', '_header')
+
+    def lookup(self, name):
+        """Returns: the cached expansion of name, None on a miss"""
+        expansion = super().lookup(name)
+        return None if expansion is None else set(expansion)
+
+    def store(self, name, expansion, dependencies, generation):
+        """Caches the expansion of name, computed from the dependencies at the given generation."""
+        return super().store(name, frozenset(expansion), generation, dependencies)
+
+class FriendGraph(InvalidatedCache):
+    """
+        In-process graph of the memberships and friendships of DataClient.are_friends:
+        for every name, the modules of its _belongs_to list and the names of its _friend list.
+        - *max_entries*: maximal number of cached names
+
+        A change of the _belongs_to or _friend list of a name evicts it.
+    """
+    PROPERTIES = ('_belongs_to', '_friend')
+
+    def store(self, name, modules, friends, generation):
+        """Caches the lists of name, read when the graph was at the given generation."""
+        return super().store(name, (frozenset(modules), frozenset(friends)), generation)
+
+class InvalidationListener:
+    """
+        Listens on the invalidation channel the write scripts publish the changed keys on,
+        and evicts them from the registered caches of the process.
+        - *channel*: the invalidation channel (settings.READ_CACHE_CHANNEL)
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self.caches = []
+        self.subscribed = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add(self, cache):
+        with self._lock:
+            self.caches.append(cache)
+            cache.set_subscribed(self.subscribed)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        client = redis.Redis(connection_pool=settings.connection_pool)
+        while True:
+            try:
+                pubsub = client.pubsub()
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message['type'] == 'subscribe':
+                        self._set_subscribed(True)
+                    elif message['type'] == 'message':
+                        key = None if message['data'] == '*' else message['data']
+                        for cache in list(self.caches):
+                            cache.invalidate(key)
+            except redis.RedisError as e:
+                logger.warning(f'InvalidationListener: invalidation channel lost ({e}), caches are cleared')
+            self._set_subscribed(False)
+            for cache in list(self.caches):
+                cache.invalidate()
+            time.sleep(1)
+
+    def _set_subscribed(self, subscribed):
+        with self._lock:
+            self.subscribed = subscribed
+            for cache in self.caches:
+                cache.set_subscribed(subscribed)
+
+_listener = None
+_read_cache = None
+_expansion_cache = None
+_friend_graph = None
+_cache_lock = threading.Lock()
+
+def _start_listening(cache):
+    global _listener
+    if _listener is None:
+        _listener = InvalidationListener(settings.READ_CACHE_CHANNEL)
+    _listener.add(cache)
+    return cache
+
+def shared_read_cache() -> ReadCache|None:
+    """The process-wide read cache, None if settings.READ_CACHE_ENTRIES is 0."""
+    global _read_cache
+    if not settings.READ_CACHE_ENTRIES:
+        return None
+    with _cache_lock:
+        if _read_cache is None:
+            _read_cache = _start_listening(ReadCache(settings.READ_CACHE_ENTRIES, settings.READ_CACHE_MAX_SIZE, settings.READ_CACHE_CHANNEL))
+        return _read_cache
+
+def shared_expansion_cache() -> ExpansionCache|None:
+    """The process-wide expansion cache, None if settings.EXPANSION_CACHE_ENTRIES is 0."""
+    global _expansion_cache
+    if not settings.EXPANSION_CACHE_ENTRIES:
+        return None
+    with _cache_lock:
+        if _expansion_cache is None:
+            _expansion_cache = _start_listening(ExpansionCache(settings.EXPANSION_CACHE_ENTRIES))
+        return _expansion_cache
+
+def shared_friend_graph() -> FriendGraph|None:
+    """The process-wide friend graph, None if settings.FRIEND_GRAPH_ENTRIES is 0."""
+    global _friend_graph
+    if not settings.FRIEND_GRAPH_ENTRIES:
+        return None
+    with _cache_lock:
+        if _friend_graph is None:
+            _friend_graph = _start_listening(FriendGraph(settings.FRIEND_GRAPH_ENTRIES))
+        return _friend_graph
@@ -0,0 +1,172 @@
+# Lua sources of the elementary writes of DatabaseConnector.
+# Each one runs atomically on the Redis server, in a single round trip (EVALSHA).
+#
+# KEYS[2] is always the registry of names (settings.NAME_REGISTRY_KEY): a key without ':'
+# is a name, it is registered when its list is created and unregistered when it empties.
+# KEYS[3] and KEYS[4] are the undo and redo lists of group ids of the writing user; the entries
+# of a group are in the stream KEYS[3] .. ':' .. group (see UndoLog).
+#
+# ARGV[1] is always the invalidation channel (settings.READ_CACHE_CHANNEL): every changed
+# key is published there, so that the read caches of all the workers can evict it.
+# ARGV[2..4] are the undo group, the command text and the maximal number of groups of the
+# undo list; an empty group means the write is not registered (replay of undo and redo).
+# The undo list is trimmed by whole groups when a new group starts, never within the running one.
+#
+# The scripts also keep the inverted indices: the set VALUE_INDEX_PREFIX + value holds the
+# name:property keys whose list contains value, the set PROPERTY_INDEX_PREFIX + property
+# holds the names that have property. The hash MEMBERSHIP_VERSIONS_KEY stamps the cached
+# permissions of the users: a change of a _belongs_to list increments the field of its module
+# (the value), a change of a read or write list the field of its user (the name).
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from configs.settings import settings
+
+PRELUDE = f"""
+local VALUE_INDEX_PREFIX = '{settings.VALUE_INDEX_PREFIX}'
+local PROPERTY_INDEX_PREFIX = '{settings.PROPERTY_INDEX_PREFIX}'
+local MEMBERSHIP_VERSIONS_KEY = '{settings.MEMBERSHIP_VERSIONS_KEY}'
+""" + """
+local function register_name(key)
+    if not string.find(key, ':', 1, true) then
+        redis.call('SADD', KEYS[2], key)
+    end
+end
+local function unregister_name(key)
+    if not string.find(key, ':', 1, true) then
+        redis.call('SREM', KEYS[2], key)
+    end
+end
+local function index_key(key, value)
+    if string.find(key, ':', 1, true) then
+        return VALUE_INDEX_PREFIX .. value
+    end
+    return PROPERTY_INDEX_PREFIX .. value
+end
+local function index_value(key, value)
+    redis.call('SADD', index_key(key, value), key)
+end
+local function unindex_value(key, value)
+    if not redis.call('LPOS', key, value) then
+        redis.call('SREM', index_key(key, value), key)
+    end
+end
+local function changed(key, value)
+    redis.call('PUBLISH', ARGV[1], key)
+    local name, property = string.match(key, '^([^:]*):(.*)$')
+    if property == '_belongs_to' then
+        redis.call('HINCRBY', MEMBERSHIP_VERSIONS_KEY, value, 1)
+    elseif property == 'read' or property == 'write' then
+        redis.call('HINCRBY', MEMBERSHIP_VERSIONS_KEY, name, 1)
+    end
+end
+-- drops the oldest groups of the undo list beyond ARGV[4] groups, with their entries, never the running one
+local function trim_undo_log()
+    while redis.call('LLEN', KEYS[3]) > tonumber(ARGV[4]) do
+        local oldest = redis.call('LINDEX', KEYS[3], 0)
+        if oldest == ARGV[2] then
+            return
+        end
+        redis.call('LPOP', KEYS[3])
+        redis.call('DEL', KEYS[3] .. ':' .. oldest)
+    end
+end
+local function register(op, key, value, position)
+    if ARGV[2] ~= '' then
+        redis.call('XADD', KEYS[3] .. ':' .. ARGV[2], '*',
+            'group', ARGV[2], 'command', ARGV[3], 'op', op, 'key', key, 'value', value, 'position', position)
+        -- a new write ends the redo history
+        for _, group in ipairs(redis.call('LRANGE', KEYS[4], 0, -1)) do
+            redis.call('DEL', KEYS[4] .. ':' .. group)
+        end
+        redis.call('DEL', KEYS[4])
+        if redis.call('LINDEX', KEYS[3], -1) ~= ARGV[2] and not redis.call('LPOS', KEYS[3], ARGV[2]) then
+            redis.call('RPUSH', KEYS[3], ARGV[2])
+            trim_undo_log()
+        end
+    end
+end
+"""
+
+# KEYS[1]: list key; ARGV[5]: value
+# Returns: position of the appended value, -1 if the value is already present
+UNIQUE_APPEND = PRELUDE + """
+if redis.call('LPOS', KEYS[1], ARGV[5]) then
+    return -1
+end
+local length = redis.call('RPUSH', KEYS[1], ARGV[5])
+if length == 1 then
+    register_name(KEYS[1])
+end
+index_value(KEYS[1], ARGV[5])
+changed(KEYS[1], ARGV[5])
+register('set', KEYS[1], ARGV[5], length - 1)
+return length - 1
+"""
+
+# KEYS[1]: list key; ARGV[5]: value, ARGV[6]: position ('' appends), ARGV[7]: '1' if unique
+# Returns: position of the inserted value, -1 if unique and the value is already present
+INSERT_AT = PRELUDE + """
+local key, value = KEYS[1], ARGV[5]
+if ARGV[7] == '1' and redis.call('LPOS', key, value) then
+    return -1
+end
+local length = redis.call('LLEN', key)
+if length == 0 then
+    register_name(key)
+end
+index_value(key, value)
+changed(key, value)
+local position = tonumber(ARGV[6])
+if position == nil or position >= length then
+    redis.call('RPUSH', key, value)
+    register('set', key, value, length)
+    return length
+end
+if position < 0 then
+    position = math.max(0, position + length)
+end
+register('set', key, value, position)
+if position == 0 then
+    redis.call('LPUSH', key, value)
+    return 0
+end
+local pivot = redis.call('LINDEX', key, position)
+if redis.call('LPOS', key, pivot) == position then
+    redis.call('LINSERT', key, 'BEFORE', pivot, value)
+    return position
+end
+-- the pivot also occurs earlier in the list: rewrite the tail instead
+local tail = redis.call('LRANGE', key, position, -1)
+redis.call('LTRIM', key, 0, position - 1)
+redis.call('RPUSH', key, value)
+for i = 1, #tail, 1000 do
+    redis.call('RPUSH', key, unpack(tail, i, math.min(i + 999, #tail)))
+end
+return position
+"""
+
+# KEYS[1]: list key; ARGV[5]: value
+# Returns: former position of the removed value, -1 if the value is not present
+REMOVE_VALUE = PRELUDE + """
+local index = redis.call('LPOS', KEYS[1], ARGV[5])
+if not index then
+    return -1
+end
+redis.call('LREM', KEYS[1], 1, ARGV[5])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    unregister_name(KEYS[1])
+end
+unindex_value(KEYS[1], ARGV[5])
+changed(KEYS[1], ARGV[5])
+register('delete', KEYS[1], ARGV[5], index)
+return index
+"""
+
+SCRIPTS = {
+    'unique_append': UNIQUE_APPEND,
+    'insert_at': INSERT_AT,
+    'remove_value': REMOVE_VALUE,
+}
@@ -0,0 +1,84 @@
+import time
+import threading
+from dataclasses import dataclass
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from configs.settings import settings
+
+@dataclass
+class SessionEntry:
+    """
+        A validated token of the session table; the times are time.monotonic() values.
+        - *user*: the user of the token
+        - *valid_until*: end of the trust in the validation, at most SESSION_CACHE_TTL seconds away
+        - *refreshed*: last push of the sliding expiry of the session, 0 if not yet from this process
+    """
+    user: str
+    valid_until: float
+    refreshed: float = 0
+
+class SessionTable:
+    """
+        In-process table of the validated tokens of a SessionManager.
+        A token is validated against the database (JWT, users membership, session key) at most
+        every ttl seconds, and never trusted beyond the expiration of its session; the sliding expiry
+        is pushed forward at most every refresh_interval seconds. A logout in another worker
+        is therefore seen within ttl seconds.
+        - *ttl*: settings.SESSION_CACHE_TTL by default
+        - *refresh_interval*: settings.SESSION_REFRESH_INTERVAL by default
+    """
+    def __init__(self, ttl=None, refresh_interval=None):
+        self.ttl = settings.SESSION_CACHE_TTL if ttl is None else ttl
+        self.refresh_interval = settings.SESSION_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        self._items = {}    # token -> SessionEntry
+        self._lock = threading.Lock()
+
+    def lookup(self, token):
+        """
+            The user of token if its validation is still trusted, None otherwise.
+            An expired entry is kept: its refresh stamp goes on with the next validation.
+        """
+        with self._lock:
+            entry = self._items.get(token)
+            if entry is None or entry.valid_until <= time.monotonic():
+                return None
+            return entry.user
+
+    def store(self, token, user, remaining):
+        """Records the validation of token for user, whose session ends in remaining seconds."""
+        now = time.monotonic()
+        with self._lock:
+            former = self._items.get(token)
+            refreshed = former.refreshed if former is not None and former.user == user else 0
+            self._items[token] = SessionEntry(user, now + min(self.ttl, remaining), refreshed)
+            # the expired validations go with the new ones, once their refresh stamp is old too
+            if len(self._items) % 1000 == 0:
+                self._items = {t: e for t, e in self._items.items()
+                               if e.valid_until > now or now - e.refreshed < self.refresh_interval}
+
+    def due_for_refresh(self, token) ->bool:
+        """
+            Whether the sliding expiry of the session of token should be pushed forward;
+            True reserves the refresh, so that concurrent commands do not repeat it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(token)
+            if entry is None:
+                # not validated by this process: nothing tells the refresh is recent
+                return True
+            if now - entry.refreshed < self.refresh_interval:
+                return False
+            entry.refreshed = now
+            return True
+
+    def discard(self, token=None, user=None):
+        """Forgets token, or all the tokens of user."""
+        with self._lock:
+            if token is not None:
+                self._items.pop(token, None)
+            if user is not None:
+                self._items = {t: e for t, e in self._items.items() if e.user != user}
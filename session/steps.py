@@ -0,0 +1,41 @@
+# Drivers of the logic shared by the sync and async storage layers.
+#
+# The logic of DataClient and AsyncDataClient (session/client_logic.py), of DatabaseConnector and
+# AsyncDatabaseConnector (session/connector_logic.py) and of PermissionSets is written once, as
+# generators: every I/O they need is yielded as a request (method, *args) and the result is sent back.
+# run executes the requests with a plain function, arun awaits them; the generator return value
+# is the result. Sub-steps compose with `yield from`.
+
+def run(steps, call):
+    """Runs steps, executing every request with call(method, *args). Returns: the result of steps"""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                result = call(*request)
+            except Exception as error:
+                request = steps.throw(error)
+            else:
+                request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+async def arun(steps, call):
+    """Runs steps, awaiting every request with call(method, *args). Returns: the result of steps"""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                result = await call(*request)
+            except Exception as error:
+                request = steps.throw(error)
+            else:
+                request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+def method_caller(target):
+    """The call of run and arun executing a request as a method of target."""
+    def call(method, *args):
+        return getattr(target, method)(*args)
+    return call
@@ -0,0 +1,98 @@
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from configs.settings import settings
+
+# (group id, command text, opened by command_group) of the running task or thread
+_undo_group = ContextVar('undo_group', default=None)
+
+def new_group_id():
+    return f'{time.time_ns()}-{secrets.token_hex(4)}'
+
+class UndoLog:
+    """
+        The persistent undo log of one user, shared by all the workers.
+        - *owner*: the user the log belongs to
+
+        Every registered write is an entry of the stream of its group, written by the write script
+        itself, with the fields group, command, op ('set' or 'delete'), key, value and position.
+        The undo and redo lists hold the ids of their groups, oldest first, and the entries of a group
+        are in the stream list key + ':' + group id, so that the commands of one user may interleave
+        their writes. Undoing a group moves its id and its entries to the redo side, redoing moves them
+        back; a new write clears the redo side.
+        The undo list keeps the last settings.undo_list_length groups, whatever their size:
+        it is trimmed by whole groups, so that a bulk write is always undone completely.
+    """
+    def __init__(self, owner='system'):
+        self.owner = owner
+        self.undo_key = f'{settings.UNDO_LOG_PREFIX}{owner}:undo_groups'
+        self.redo_key = f'{settings.UNDO_LOG_PREFIX}{owner}:redo_groups'
+
+    @property
+    def keys(self) ->list:
+        return [self.undo_key, self.redo_key]
+
+    @staticmethod
+    def entries_key(groups_key, group) ->str:
+        """The stream of the entries of group, on the side (undo or redo) of the list groups_key."""
+        return f'{groups_key}:{group}'
+
+    def script_args(self, register=True) ->list:
+        """The registration arguments of the write scripts: group, command and maximal number of groups."""
+        group = _undo_group.get()
+        if not register:
+            return ['', '', 0]
+        if group is None:
+            group = self.start_group()
+        return [group[0], group[1], settings.undo_list_length]
+
+    def start_group(self, message='command'):
+        """Starts a new group for the following writes, unless a command group is open."""
+        group = _undo_group.get()
+        if group is not None and group[2]:
+            return group
+        group = (new_group_id(), message, False)
+        _undo_group.set(group)
+        return group
+
+    @staticmethod
+    @contextmanager
+    def command_group(message='command'):
+        """All the writes inside the block form one group; nested blocks join the outer group."""
+        group = _undo_group.get()
+        if group is not None and group[2]:
+            yield group
+            return
+        token = _undo_group.set((new_group_id(), message, True))
+        try:
+            yield _undo_group.get()
+        finally:
+            _undo_group.reset(token)
+
+    @staticmethod
+    def group_entries(client, stream, whole_group=True) ->list:
+        """
+            Reads the entries of one group, page by page.
+            - *stream*: the entries stream of the group, see entries_key
+            - *whole_group*: if False, only the newest entry is returned
+            Returns: list of (entry id, fields), newest first
+        """
+        if not whole_group:
+            return client.xrevrange(stream, count=1)
+        entries = []
+        last = '+'
+        while True:
+            page = client.xrevrange(stream, max=last, count=settings.PIPELINE_BATCH_SIZE)
+            entries.extend(page)
+            if len(page) < settings.PIPELINE_BATCH_SIZE:
+                return entries
+            last = f'({page[-1][0]}'
+
+    def __repr__(self):
+        return f"UndoLog({self.owner})"
@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import fakeredis
+import pytest
+import redis
+import redis.asyncio
+from passlib.context import CryptContext
+
+from configs.settings import settings
+
+# The tests run on an in-process fakeredis server (with Lua) instead of settings.REDIS_URL;
+# the shared pools are set before any connector is created.
+server = fakeredis.FakeServer()
+settings._connection_pool = redis.ConnectionPool(
+    connection_class=fakeredis.FakeRedisConnection, server=server, decode_responses=True)
+settings._async_connection_pool = redis.asyncio.ConnectionPool(
+    connection_class=fakeredis.FakeAsyncRedisConnection, server=server, decode_responses=True)
+
+from session import SessionManager
+from session.client import DataClient
+from session.permissions import shared_permission_sets
+from session import read_cache
+
+PASSWORD = 'password'
+
+@pytest.fixture(autouse=True)
+def database():
+    """An empty database and empty process-wide caches for every test."""
+    client = redis.Redis(connection_pool=settings.connection_pool)
+    client.flushall()
+    shared_permission_sets()._items.clear()
+    for cache in (read_cache._read_cache, read_cache._expansion_cache, read_cache._friend_graph):
+        if cache is not None:
+            cache.invalidate()
+    yield client
+
+@pytest.fixture
+def data_client():
+    client = DataClient(owner='tester')
+    client.server.load_scripts()
+    client.new('zoo', 'zoo')
+    return client
+
+@pytest.fixture
+def session():
+    session = SessionManager()
+    session.start()
+    # cheap hashes for the logins of the tests
+    session.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+    session.system_data_client.delete('user-su:password')
+    session.system_data_client.set(f'user-su:password:{session.pwd_context.hash(PASSWORD)}')
+    yield session
+    session.subcommand_pool.shutdown(wait=False, cancel_futures=True)
+
+@pytest.fixture
+def token(session):
+    return session.login('user-su', PASSWORD)['access_token']
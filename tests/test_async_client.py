@@ -0,0 +1,59 @@
+import asyncio
+
+from session.async_client import AsyncDataClient
+from configs.settings import settings
+
+# The same writes through DataClient and AsyncDataClient leave the same database.
+
+def _scenario():
+    return [
+        ('new_many', (['lion', 'bear', 'puma'], 'zoo')),
+        ('new', ('eagle', 'aviary')),
+        ('set_many', (['lion:color:yellow', 'bear:color:brown', 'lion:friend:bear', 'puma:size:small,xl'],)),
+        ('set', ('lion:bear:cub',)),
+        ('set', ('eagle:prey:lion',)),
+        ('delete', ('puma:size:xl',)),
+    ]
+
+def _dump(database):
+    return {key: database.lrange(key, 0, -1) for key in database.scan_iter(_type='list')
+            if not key.startswith(settings.INTERNAL_PREFIX)}
+
+def _run_sync(data_client):
+    return [getattr(data_client, method)(*args) for method, args in _scenario()]
+
+def _run_async():
+    async def scenario():
+        client = AsyncDataClient(owner='tester')
+        await client.new('zoo', 'zoo')
+        return [await getattr(client, method)(*args) for method, args in _scenario()]
+    return asyncio.run(scenario())
+
+def test_async_writes_match_the_sync_ones(data_client, database):
+    results = _run_sync(data_client)
+    expected = _dump(database)
+    database.flushall()
+    data_client.server.invalidate()
+    assert _run_async() == results
+    assert _dump(database) == expected
+
+def test_async_gets_match_the_sync_ones(data_client):
+    _run_sync(data_client)
+    queries = ['lion', '*:color:*', '*:*:zoo', 'zoo:_header', 'lion,bear:color', '*:size']
+    permitted = data_client.permissions('user-none')
+    async def gets():
+        client = AsyncDataClient(owner='tester')
+        return [await client.get(q, permitted=p) for q in queries for p in (['_all'], ['zoo'], permitted)]
+    assert asyncio.run(gets()) == [data_client.get(q, permitted=p) for q in queries for p in (['_all'], ['zoo'], permitted)]
+
+def test_async_set_many_is_undone_at_once(data_client):
+    async def writes():
+        client = AsyncDataClient(owner='tester')
+        await client.new_many(['lion', 'bear'], 'zoo')
+        return await client.set_many([f'lion:n{i}:v{i}' for i in range(50)])
+    assert asyncio.run(writes()) == 100
+    assert len(data_client.get('lion')) == 51
+    data_client.server.undo()
+    assert len(data_client.get('lion')) == 1
+    data_client.server.undo()
+    assert 'lion' not in data_client
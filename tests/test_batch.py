@@ -0,0 +1,60 @@
+from configs.settings import settings
+from session.connector import DatabaseConnector
+
+def test_atomic_batch_rolls_back_all_its_writes(session, token, monkeypatch):
+    monkeypatch.setattr(settings, 'undo_list_length', 5)
+    session.command('new zoo; lion', token)
+    before = len(session.command('get *:*:*', token).output)
+    commands = [f'set lion:property{i}:value{i}' for i in range(800)] + ['bogus((']
+
+    responses = session.batch(commands, token, atomic=True)
+
+    assert not any(response.success for response in responses)
+    assert 'rolled back' in responses[0].message
+    assert len(session.command('get *:*:*', token).output) == before
+    # the rolled back writes are not kept for redo
+    session.command('redo', token)
+    assert len(session.command('get *:*:*', token).output) == before
+
+def test_incomplete_rollback_is_an_error(session, token, monkeypatch):
+    session.command('new zoo; lion', token)
+    rollback = DatabaseConnector.rollback
+    def rollback_after_a_write(server, group):
+        # another command of the user removes a value of the batch before the rollback
+        server.delete('lion:color', 'yellow', register=False)
+        return rollback(server, group)
+    monkeypatch.setattr(DatabaseConnector, 'rollback', rollback_after_a_write)
+
+    responses = session.batch(['set lion:color:yellow', 'bogus(('], token, atomic=True)
+
+    assert 'Error: incomplete rollback, undid 1 of 2 operations' in responses[0].message
+    assert 'rolled back' not in responses[0].message
+    assert session.command('get lion:color', token).output.format('value') == []
+
+def test_batch_results_follow_the_commands(session, token):
+    responses = session.batch(['new zoo; lion', 'set lion:color:yellow', 'set lion:age:7', 'bogus((', 'get lion:color'], token)
+
+    assert [response.success for response in responses] == [True, True, True, False, True]
+    assert responses[1].message.startswith('added 2 entries')
+    assert responses[4].output.format('value') == ['yellow']
+
+def test_batch_sets_see_the_earlier_commands(session, token):
+    responses = session.batch(['new zoo; lion; bear', 'set lion:friend:bear', 'set bear:color:brown', 'get bear'], token)
+
+    assert all(response.success for response in responses)
+    assert 'bear:lion:friend' in [repr(t) for t in responses[3].output]
+
+def test_batch_with_an_invalid_token(session):
+    responses = session.batch(['get lion', 'get bear'], 'invalid')
+    assert [response.message for response in responses] == ['invalid token', 'invalid token']
+
+def test_atomic_batch_stops_at_a_parse_error(session, token):
+    session.command('new zoo; lion', token)
+    responses = session.batch(['get lion', 'get lion:(', 'get lion:color'], token, atomic=True)
+
+    assert responses[1].message.startswith('Error: mismatched parentheses')
+    assert responses[2].message.startswith('not executed')
+
+def test_parse_errors_are_not_concurrent(session):
+    assert session.concurrent(session.parser.parse('get lion'))
+    assert not session.concurrent(session.parser.parse('get lion:('))
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from session.client_pool import ClientPool
+from session.command_plan import current_context
+
+def test_reset_drops_the_state_of_the_former_user():
+    pool = ClientPool(size=1, low_water=0)
+    pool.warm()
+    data_client, async_data_client = pool.acquire('user-a')
+    data_client.eval('secret = 42')
+    assert data_client.server.undo_log.owner == 'user-a'
+    pool.release(data_client, async_data_client)
+
+    again, async_again = pool.acquire('user-b')
+    assert again is data_client
+    assert 'secret' not in again.eval.symtable
+    assert again.eval('abs(-2)') == 2
+    assert again.server.undo_log.owner == 'user-b'
+    assert async_again.server.undo_log.owner == 'user-b'
+
+def test_the_pool_is_refilled_below_its_low_water_mark():
+    pool = ClientPool(size=4, low_water=2)
+    pool.warm()
+    pairs = [pool.acquire(f'user-{i}') for i in range(3)]
+    deadline = time.time() + 30
+    while len(pool) < pool.size and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(pool) == pool.size
+    assert pool.built == 0
+    assert all(pool.acquire('user-x')[0] is not pair[0] for pair in pairs)
+
+def test_a_held_pair_is_recycled_after_its_last_command():
+    pool = ClientPool(size=2, low_water=0)
+    pool.warm()
+    pair = pool.acquire('user-a')
+    lease = pool.hold(*pair)
+    pool.release(*pair)
+    # a command of user-a still runs: the pair is not lent again
+    assert pair[0] not in [pool.acquire('user-b')[0] for _ in range(2)]
+    assert pair[0].server.undo_log.owner == 'user-a'
+
+    lease.close()
+    assert pair[0].server.undo_log.owner == 'system'
+    assert pool.acquire('user-c')[0] is pair[0]
+
+def test_logout_during_a_command_keeps_the_clients(session, token):
+    lease = session.lease_clients('user-su')
+    session.logout(token)
+    assert lease.data_client.server.undo_log.owner == 'user-su'
+    lease.close()
+    assert lease.data_client.server.undo_log.owner == 'system'
+
+def test_relogin_keeps_the_clients_of_the_user(session, token):
+    data_client = session.login_data['user-su']
+    session.login('user-su', 'password')
+    assert session.login_data['user-su'] is data_client
+
+def test_a_stream_holds_the_clients_only_while_it_is_iterated(session, token):
+    session.command('new zoo; lion; bear', token)
+    lease = session.clients._lent[id(session.login_data['user-su'])]
+    async def scenario():
+        response, chunks = await session.astream('get *:*:*', token, chunk_size=1)
+        # nothing is held before the first step: a client gone meanwhile leaks nothing
+        held = [lease.users]
+        async for _ in chunks:
+            held.append(lease.users)
+            assert current_context(token).user == 'user-su'
+            break
+        await chunks.aclose()
+        held.append(lease.users)
+        return held
+    assert asyncio.run(scenario()) == [0, 1, 0]
+    assert current_context(token) is None
@@ -0,0 +1,54 @@
+import pytest
+from asteval import Interpreter
+
+from session.expressions import Expression
+from utils.triplets import Triplet
+
+TRIPLETS = [Triplet(f'animal{i}:age:{age}') for i, age in enumerate(['7', '-2.5', '10', '0', '3e1', '10.0'])]
+
+@pytest.mark.parametrize('command', [
+    'float(value) > 3',
+    'float(value) >= 10',
+    '0 <= float(value) < 10',
+    '-3 < float(value) != 7',
+    'float(value) == 10',
+    '5 > float(value)',
+])
+def test_vectorized_comparisons_match_the_scalar_evaluation(command):
+    expression = Expression(Interpreter(), command)
+    chosen = expression.vectorized(TRIPLETS)
+
+    assert chosen is not None
+    assert list(chosen) == [bool(expression(*t)) for t in TRIPLETS]
+    assert expression.filter(TRIPLETS) == [t for t in TRIPLETS if expression(*t)]
+
+@pytest.mark.parametrize('command', [
+    'value.startswith("1")',
+    'float(value) > 3 and name != "animal0"',
+    'float(value) > len(name)',
+    'value > "3"',
+])
+def test_other_expressions_are_evaluated_triplet_by_triplet(command):
+    expression = Expression(Interpreter(), command)
+
+    assert expression.vectorized(TRIPLETS) is None
+    assert expression.filter(TRIPLETS) == [t for t in TRIPLETS if expression(*t)]
+
+def test_a_field_that_is_not_a_number_falls_back_and_reports_the_error():
+    expression = Expression(Interpreter(), 'float(value) > 3')
+    triplets = TRIPLETS + [Triplet('animal9:age:old')]
+
+    assert expression.vectorized(triplets) is None
+    with pytest.raises(ValueError, match="Error in command 'float\\(value\\) > 3'"):
+        expression.filter(triplets)
+
+def test_invalid_expressions_raise_value_errors():
+    with pytest.raises(ValueError, match="Error in command 'float\\(value\\) >'"):
+        Expression(Interpreter(), 'float(value) >')
+    expression = Expression(Interpreter(), 'undefined_variable > 3')
+    with pytest.raises(ValueError, match='undefined_variable'):
+        expression.filter(TRIPLETS)
+
+def test_the_fields_are_bound_for_every_triplet():
+    expression = Expression(Interpreter(), 'triplet if float(value) > 5 else None')
+    assert [expression(*t) for t in TRIPLETS[:2]] == ['animal0:age:7', None]
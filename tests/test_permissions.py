@@ -0,0 +1,50 @@
+import asyncio
+
+from session.async_client import AsyncDataClient
+from session.permissions import shared_permission_sets
+
+def _user(data_client, name, modules):
+    data_client.new(name, 'users')
+    for module in modules:
+        data_client.set(f'{name}:read:{module}')
+
+def test_permissions_follow_the_members_of_their_modules(data_client):
+    data_client.new('aviary', 'aviary')
+    data_client.new('lion', 'zoo')
+    _user(data_client, 'keeper', ['zoo'])
+    assert data_client.permissions('keeper').names == {'zoo', 'lion'}
+
+    data_client.new('bear', 'zoo')
+    assert data_client.permissions('keeper').names == {'zoo', 'lion', 'bear'}
+    data_client.set('keeper:read:aviary')
+    assert data_client.permissions('keeper').names == {'zoo', 'lion', 'bear', 'aviary'}
+
+def test_other_modules_keep_the_cached_permissions(data_client):
+    data_client.new('aviary', 'aviary')
+    data_client.new('lion', 'zoo')
+    _user(data_client, 'keeper', ['zoo'])
+    permissions = data_client.permissions('keeper')
+
+    data_client.new('eagle', 'aviary')
+    _user(data_client, 'visitor', ['aviary'])
+    assert data_client.permissions('keeper') is permissions
+    assert data_client.permissions('visitor').names == {'aviary', 'eagle'}
+
+def test_a_flush_resets_every_stamp(data_client):
+    data_client.new('lion', 'zoo')
+    _user(data_client, 'keeper', ['zoo'])
+    permissions = data_client.permissions('keeper')
+    data_client.server.reset_membership_version()
+    assert data_client.permissions('keeper') is not permissions
+
+def test_async_lookup_shares_the_stamps(data_client):
+    data_client.new('lion', 'zoo')
+    _user(data_client, 'keeper', ['zoo'])
+    permissions = data_client.permissions('keeper')
+
+    async def lookup():
+        async_data_client = AsyncDataClient(owner='tester')
+        return await shared_permission_sets().alookup(async_data_client.server, 'keeper')
+    assert asyncio.run(lookup()) is permissions
+    data_client.new('bear', 'zoo')
+    assert asyncio.run(lookup()).names == {'zoo', 'lion', 'bear'}
@@ -0,0 +1,57 @@
+import pytest
+
+from session.command_plan import ExecutionContext, command_context
+from session.permissions import shared_permission_sets
+from session.planner import GetPlan, estimate_paths
+from utils.triplets import tripletset_to_sorted_list
+
+class ForcedPlan(GetPlan):
+    """A GetPlan taking the given access path whatever the estimates."""
+    def __init__(self, path):
+        super().__init__()
+        self.forced = path
+
+    def choose(self, statistics, property_list, value_list, permitted):
+        self.estimates = estimate_paths(statistics, property_list, value_list, permitted)
+        assert self.forced in self.estimates
+        self.path = self.forced
+        return self.path
+
+@pytest.mark.parametrize('triplet, paths', [
+    ('*:color:yellow', ['value_index', 'property_index', 'permitted_names', 'module_members', 'registry']),
+    ('*:color:*', ['property_index', 'permitted_names', 'module_members', 'registry']),
+    ('*:*:*', ['permitted_names', 'module_members', 'registry']),
+])
+def test_every_access_path_gives_the_same_result(data_client, triplet, paths):
+    data_client.new('park', 'park')
+    for name, module in [('lion', 'zoo'), ('tiger', 'zoo'), ('bear', 'park')]:
+        data_client.new(name, module)
+        data_client.set(f'{name}:color:yellow')
+    # a _member entry without the matching _belongs_to, and the reverse: the _belongs_to lists decide
+    data_client.server.set('zoo:_member', 'bear')
+    for key, value in [('panda', '_belongs_to'), ('panda:_belongs_to', 'zoo'), ('panda', 'color'), ('panda:color', 'yellow')]:
+        data_client.server.set(key, value)
+    data_client.server.set('user-a:read', 'zoo')
+    permissions = shared_permission_sets().lookup(data_client.server, 'user-a')
+
+    results = {}
+    for path in paths:
+        permitted = permissions if path == 'permitted_names' else list(permissions)
+        results[path] = tripletset_to_sorted_list(data_client.get(triplet, permitted=permitted, plan=ForcedPlan(path)))
+
+    names = {entry.split(':')[0] for entry in results[paths[0]]}
+    assert 'panda' in names and 'bear' not in names
+    assert all(result == results[paths[0]] for result in results.values()), results
+
+def test_reads_are_counted_per_command_tree(data_client):
+    data_client.new('lion', 'zoo')
+    explained, other = ExecutionContext('user-a', 'token-a'), ExecutionContext('user-b', 'token-b')
+    plan = GetPlan()
+    with command_context(explained):
+        with plan.stage('fetch'):
+            data_client.get('zoo:_member')
+            # another command of the same clients meanwhile
+            with command_context(other):
+                data_client.get('*:*:*')
+    assert plan.actual_reads == explained.reads > 0
+    assert other.reads > 0
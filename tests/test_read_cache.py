@@ -0,0 +1,66 @@
+from session.read_cache import ExpansionCache, FriendGraph, ReadCache
+
+def subscribed_expansion_cache(server, max_entries=1000):
+    cache = ExpansionCache(max_entries)
+    cache.set_subscribed(True)
+    server.expansion_cache = cache
+    return cache
+
+def test_expand_reads_the_missed_names_together(data_client, monkeypatch):
+    server = data_client.server
+    cache = subscribed_expansion_cache(server)
+    names = [f'name{i}' for i in range(300)]
+    data_client.new_many(names, 'zoo')
+    data_client.new('lion', 'zoo')
+    data_client.set('name0:_alias:lion')
+    calls = []
+    get_many = server.get_many
+    monkeypatch.setattr(server, 'get_many', lambda keys: calls.append(len(keys)) or get_many(keys))
+
+    expansion = data_client.expand(['zoo', *names])
+
+    # one pipelined read per level of the traversal, not one traversal per name
+    assert calls == [2*301, 2]
+    assert expansion == {'zoo', 'lion', *names}
+    assert cache.stats()['entries'] == 301
+    assert data_client.expand(['name0']) == {'lion'}
+    assert len(calls) == 2
+
+def test_an_expansion_is_refused_only_if_a_dependency_changed(data_client):
+    cache = subscribed_expansion_cache(data_client.server)
+    generation = cache.generation
+    cache.invalidate('bear:_member')
+    cache.store('lion', {'cub'}, {'lion', 'cub'}, generation)
+    assert cache.lookup('lion') == {'cub'}
+
+    generation = cache.generation
+    cache.invalidate('cub:_alias')
+    assert cache.lookup('lion') is None
+    cache.store('lion', {'cub'}, {'lion', 'cub'}, generation)
+    assert cache.lookup('lion') is None
+
+    generation = cache.generation
+    cache.invalidate()
+    cache.store('lion', {'cub'}, {'lion', 'cub'}, generation)
+    assert cache.lookup('lion') is None
+
+def test_each_cache_evicts_the_entries_a_key_concerns():
+    cache = ReadCache(max_entries=10, max_size=20, channel='')
+    graph = FriendGraph(max_entries=10)
+    for c in (cache, graph):
+        c.set_subscribed(True)
+    generation = cache.generation
+    cache.store('lion:color', ['yellow'], generation)
+    cache.store('lion:food', ['meat'*10], generation)   # larger than max_size
+    graph.store('lion', ['zoo'], [], graph.generation)
+    assert cache.lookup('lion:color') == ['yellow'] and cache.lookup('lion:food') is None
+    assert cache.stats()['size'] == len('lion:color') + len('yellow')
+
+    for c in (cache, graph):
+        c.invalidate('lion:color')
+    assert cache.lookup('lion:color') is None
+    # a color is not a membership or a friendship
+    assert graph.lookup('lion') == (frozenset(['zoo']), frozenset())
+    graph.invalidate('lion:_friend')
+    assert graph.lookup('lion') is None
+    assert 'size' not in graph.stats()
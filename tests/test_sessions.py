@@ -0,0 +1,29 @@
+import time
+
+from session.session_table import SessionTable
+
+def test_revalidation_keeps_the_refresh_stamp():
+    table = SessionTable(ttl=0.05, refresh_interval=60)
+    table.store('token', 'user-a', remaining=900)
+    assert table.due_for_refresh('token')
+    time.sleep(0.06)
+    assert table.lookup('token') is None
+    table.store('token', 'user-a', remaining=900)
+    assert table.lookup('token') == 'user-a'
+    assert not table.due_for_refresh('token')
+
+def test_refresh_interval_is_not_bounded_by_the_cache_ttl(session, token, monkeypatch):
+    monkeypatch.setattr(session, 'sessions', SessionTable(ttl=0.2, refresh_interval=60))
+    server = session.system_data_client.server
+    refreshes = []
+    refresh_session = server.refresh_session
+    monkeypatch.setattr(server, 'refresh_session', lambda *args: refreshes.append(args) or refresh_session(*args))
+    for _ in range(5):
+        assert session.command('get *:_member:*', token).success
+        time.sleep(0.3)
+    assert len(refreshes) == 1
+
+def test_logout_forgets_the_token(session, token):
+    assert session.get_user_by_token(token) == 'user-su'
+    session.logout(token)
+    assert session.get_user_by_token(token) is None
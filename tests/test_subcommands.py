@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from contextlib import closing
+
+from configs.settings import settings
+from session.command_plan import command_context
+
+ANIMALS = ['lion', 'bear', 'puma', 'wolf', 'lynx', 'fox', 'owl', 'hare']
+
+def _zoo(session, token):
+    session.command('new zoo; ' + '; '.join(ANIMALS), token)
+    session.command('set ' + '; '.join(f'{animal}:color:{animal}-color' for animal in ANIMALS), token)
+    return [session.parser.parse(f'get {animal}:color') for animal in ANIMALS]
+
+class Gauge:
+    """The number of sub-commands running at once, and its maximum."""
+    def __init__(self):
+        self.running = 0
+        self.maximum = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.running += 1
+            self.maximum = max(self.maximum, self.running)
+
+    def __exit__(self, *args):
+        with self._lock:
+            self.running -= 1
+
+def test_parallel_siblings_keep_their_order(session, token, monkeypatch):
+    nodes = _zoo(session, token)
+    run_subcommand = session.run_subcommand
+    def slow_first(node, token):
+        # the first siblings finish last
+        time.sleep(0.01*(len(ANIMALS) - ANIMALS.index(node.argument.split(':')[0])))
+        return run_subcommand(node, token)
+    monkeypatch.setattr(session, 'run_subcommand', slow_first)
+
+    context = session.login_context(token)
+    with closing(context.lease), command_context(context):
+        outputs = session.run_subcommands(nodes, token)
+
+    assert [output.format('value') for output in outputs] == [[f'{animal}-color'] for animal in ANIMALS]
+
+def test_parallel_siblings_never_exceed_the_concurrency(session, token, monkeypatch):
+    monkeypatch.setattr(settings, 'SUBCOMMAND_CONCURRENCY', 3)
+    nodes = _zoo(session, token)
+    gauge = Gauge()
+    run_subcommand = session.run_subcommand
+    def gauged(node, token):
+        with gauge:
+            time.sleep(0.02)
+            return run_subcommand(node, token)
+    monkeypatch.setattr(session, 'run_subcommand', gauged)
+
+    context = session.login_context(token)
+    with closing(context.lease), command_context(context):
+        outputs = session.run_subcommands(nodes, token)
+
+    assert len(outputs) == len(ANIMALS)
+    assert gauge.maximum == settings.SUBCOMMAND_CONCURRENCY
+
+def test_async_parallel_siblings_keep_their_order_and_the_concurrency(session, token, monkeypatch):
+    monkeypatch.setattr(settings, 'SUBCOMMAND_CONCURRENCY', 3)
+    nodes = _zoo(session, token)
+    gauge = Gauge()
+    arun_subcommand = session.arun_subcommand
+    async def gauged(node, token):
+        with gauge:
+            await asyncio.sleep(0.01*(len(ANIMALS) - ANIMALS.index(node.argument.split(':')[0])))
+            return await arun_subcommand(node, token)
+    monkeypatch.setattr(session, 'arun_subcommand', gauged)
+
+    async def scenario():
+        context = session.login_context(token)
+        with closing(context.lease), command_context(context):
+            return await session.arun_subcommands(nodes, token)
+    outputs = asyncio.run(scenario())
+
+    assert [output.format('value') for output in outputs] == [[f'{animal}-color'] for animal in ANIMALS]
+    assert gauge.maximum == settings.SUBCOMMAND_CONCURRENCY
@@ -0,0 +1,13 @@
+from utils.triplets import Triplet, TripletSet
+
+def test_set_operations_keep_the_insertion_order():
+    a = TripletSet('lion:color:yellow;bear:color:brown;puma:color:grey')
+    b = TripletSet(['puma:color:grey', 'lion:color:yellow', 'wolf:color:grey'])
+    assert [str(t) for t in a & b] == ['lion:color:yellow', 'puma:color:grey']
+    assert [str(t) for t in a - b] == ['bear:color:brown']
+    assert [str(t) for t in a | b] == ['lion:color:yellow', 'bear:color:brown', 'puma:color:grey', 'wolf:color:grey']
+
+def test_set_operations_accept_iterables_of_triplets():
+    a = TripletSet(['lion:color:yellow', 'bear:color:brown'])
+    assert a & [Triplet('bear', 'color', 'brown')] == TripletSet(['bear:color:brown'])
+    assert a - ['lion:color:yellow'] == TripletSet(['bear:color:brown'])
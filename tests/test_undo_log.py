@@ -0,0 +1,73 @@
+import contextvars
+
+from configs.settings import settings
+
+def triplet_count(data_client):
+    return len(data_client.get('*:*:*'))
+
+def test_undo_of_a_group_larger_than_the_cap(data_client, monkeypatch):
+    monkeypatch.setattr(settings, 'undo_list_length', 3)
+    for i in range(5):
+        data_client.new(f'name{i}', 'zoo')
+    before = triplet_count(data_client)
+    data_client.set_many([f'name{i % 5}:property{i}:value{i}' for i in range(3000)])
+    assert triplet_count(data_client) == before + 3000
+
+    assert data_client.server.undo() == 6000
+    assert triplet_count(data_client) == before
+
+def test_undo_log_is_trimmed_by_whole_groups(data_client, monkeypatch):
+    monkeypatch.setattr(settings, 'undo_list_length', 2)
+    data_client.new('lion', 'zoo')
+    data_client.set_many([f'lion:size:{i}' for i in range(1500)])
+    data_client.set('lion:color:yellow')
+    data_client.set('lion:age:7')
+    server = data_client.server
+    groups = server.client.lrange(server.undo_log.undo_key, 0, -1)
+    assert len(groups) == 2
+    # the entries of the trimmed groups are dropped with them
+    assert sorted(server.client.keys(f'{server.undo_log.undo_key}:*')) == sorted(
+        server.undo_log.entries_key(server.undo_log.undo_key, group) for group in groups)
+
+    assert server.undo() == 2
+    assert server.undo() == 2
+    # the older groups are gone, whole
+    assert server.undo() == 0
+    assert len(data_client.get('lion:size')) == 1500
+
+def test_redo_keeps_the_group_count(data_client, monkeypatch):
+    monkeypatch.setattr(settings, 'undo_list_length', 2)
+    data_client.new('lion', 'zoo')
+    data_client.set('lion:color:yellow')
+    server = data_client.server
+    assert server.undo() == 2
+    assert server.redo() == 2
+    assert server.client.llen(server.undo_log.undo_key) == 2
+    assert server.client.llen(server.undo_log.redo_key) == 0
+    assert data_client.get('lion:color').format('value') == ['yellow']
+
+def test_interleaved_groups_are_undone_by_id(data_client):
+    """Two commands of one user writing in turn: each undo reverts exactly one of them."""
+    data_client.new('lion', 'zoo')
+    server = data_client.server
+    before = server.client.llen(server.undo_log.undo_key)
+    contexts = {'A': contextvars.copy_context(), 'B': contextvars.copy_context()}
+    groups = {label: server.command_group(label) for label in contexts}
+    for label, context in contexts.items():
+        context.run(groups[label].__enter__)
+    contexts['A'].run(data_client.set, 'lion:color:yellow')
+    contexts['B'].run(data_client.set, 'lion:age:7')
+    contexts['A'].run(data_client.set, 'lion:size:big')
+    contexts['B'].run(data_client.set, 'lion:weight:190')
+    for label, context in contexts.items():
+        context.run(groups[label].__exit__, None, None, None)
+    assert server.client.llen(server.undo_log.undo_key) == before + 2
+
+    # B started last: its two triplets are undone, whole, and A is untouched
+    assert server.undo() == 4
+    assert data_client.get('lion:age').format('value') == data_client.get('lion:weight').format('value') == []
+    assert data_client.get('lion:color').format('value') == ['yellow']
+    assert server.undo() == 4
+    assert data_client.get('lion:*:*').format('property') == ['_belongs_to']
+    assert server.redo() == 4
+    assert data_client.get('lion:size').format('value') == ['big']
@@ -55,9 +55,7 @@ def process_hierarchy_text(
         if name:
             create_node_dict[name] = [level, entrylist]
     
-    for name in create_node_dict:
-        addednodes += data_client.new(name, datamodule)
-    
+    triplets = []
     for name in create_node_dict:
         level, entrylist = create_node_dict[name]
         for element in entrylist:
@@ -68,7 +66,7 @@ def process_hierarchy_text(
             else:
                 property = property.strip()
                 value = value[0].strip()
-            data_client.set((name, property, value))
+            triplets.append((name, property, value))
 
     pnodes = []
     for name in create_node_dict:
@@ -77,9 +75,14 @@ def process_hierarchy_text(
             pnodes.pop()
         if pnodes:
             parent = pnodes[-1][1]
-            if parent_name: data_client.set((name, parent_name, parent))
-            if child_name: data_client.set((parent, child_name, name))
+            if parent_name: triplets.append((name, parent_name, parent))
+            if child_name: triplets.append((parent, child_name, name))
         pnodes.append([level,name])
+
+    # the names, their properties and the hierarchy form a single undo group
+    with data_client.server.command_group(f'hierarchy into module {datamodule}'):
+        addednodes += data_client.new_many(create_node_dict, datamodule)
+        data_client.set_many(triplets)
     return addednodes
 
 def next_line_and_header(textlines:list[str], header={}):
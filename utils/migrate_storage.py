@@ -0,0 +1,81 @@
+import redis
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from configs.settings import settings
+
+from configs.logging_config import setup_logger
+logger = setup_logger(__file__)
+
+def migrate_key(client:redis.Redis, key:str) -> bool:
+    """
+        Converts one comma-joined string key into a native Redis list, in place.
+        The key is WATCH-ed, so a concurrent write aborts the conversion of that key.
+        Returns: True if the key was converted
+    """
+    with client.pipeline(transaction=True) as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.type(key) != 'string':
+                return False
+            values = pipe.get(key).split(',')
+            pipe.multi()
+            pipe.delete(key)
+            pipe.rpush(key, *values)
+            pipe.execute()
+            return True
+        except redis.WatchError:
+            logger.warning(f'migrate_key: {key} changed during migration, skipped')
+            return False
+
+def migrate_storage(client:redis.Redis, dry_run=False, batch_size=1000):
+    """
+        Converts every comma-joined string key of the keyspace into a native Redis list.
+        Keys under settings.INTERNAL_PREFIX (lock, indices, ...) are left untouched.
+        - *dry_run*: only count the keys to be converted
+        Returns: number of converted keys
+    """
+    converted = 0
+    for key in client.scan_iter(count=batch_size, _type='string'):
+        if key.startswith(settings.INTERNAL_PREFIX):
+            continue
+        if dry_run or migrate_key(client, key):
+            converted += 1
+    return converted
+
+if __name__ == "__main__":
+    app_name = sys.argv.pop(0)
+    redis_url = settings.REDIS_URL
+    dry_run = False
+
+    while sys.argv:
+        command = sys.argv.pop(0)
+        if command == '-help':
+            print(\
+    f"""
+    This utility converts a database written with comma-joined string values
+    into the native Redis list layout used by DatabaseConnector.
+    Stop the application servers before running it.
+    Usage:
+        {app_name} <flags>
+
+    The following flags and parameters are allowed:
+    '-url' : Redis URL; default is settings.REDIS_URL ({settings.REDIS_URL})
+    '-dry-run' : only count the keys that would be converted
+    """)
+            sys.exit(0)
+        if command == '-url':
+            redis_url = sys.argv.pop(0)
+            continue
+        if command == '-dry-run':
+            dry_run = True
+            continue
+
+    client = redis.Redis.from_url(redis_url, decode_responses=True)
+    converted = migrate_storage(client, dry_run=dry_run)
+    if dry_run:
+        logger.info(f'migrate_storage: {converted} keys to convert')
+    else:
+        logger.info(f'migrate_storage: converted {converted} keys')
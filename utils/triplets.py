@@ -7,11 +7,33 @@ from configs.logging_config import setup_logger
 logger = setup_logger(__file__)
 
 class Triplet:
+    """
+        An immutable name:property:value triplet, backed by a tuple with its hash computed once.
+        It is built from 'name:property:value' strings, from fields (missing fields are '*'),
+        from a tuple of fields or from another Triplet, which is not parsed again.
+    """
+    __slots__ = ('data', '_hash')
+
     def __init__(self, *args):
-        self.data = ['*' ,'*' ,'*']
-        for arg in args[::-1]:
-            self.data = [x.strip() for x in str(arg).split(':')] + self.data
-        self.data = self.data[:3]
+        if len(args) == 1:
+            arg = args[0]
+            if isinstance(arg, Triplet):
+                self.data, self._hash = arg.data, arg._hash
+                return
+            if type(arg) is tuple:
+                args = arg
+        if (len(args) == 3 and type(args[0]) is str and type(args[1]) is str and type(args[2]) is str
+                and ':' not in args[0] and ':' not in args[1] and ':' not in args[2]):
+            # the fields themselves, nothing to split
+            self.data = (args[0].strip(), args[1].strip(), args[2].strip())
+        else:
+            fields = []
+            for arg in args:
+                fields += str(arg).split(':')
+                if len(fields) >= 3:
+                    break
+            self.data = tuple([x.strip() for x in fields[:3]] + ['*']*(3 - len(fields)))
+        self._hash = hash(self.data)
 
     def __iter__(self):
         return iter(self.data)
@@ -19,13 +41,13 @@ class Triplet:
     def __eq__(self, other):
         if not isinstance(other, Triplet):
             return NotImplemented
-        return self.data == other.data
+        return self._hash == other._hash and self.data == other.data
 
     def __len__(self):
         return 3
 
     def __hash__(self):
-        return hash(':'.join(self.data))
+        return self._hash
 
     def __repr__(self):
         return ':'.join(self.data)
@@ -40,12 +62,15 @@ class TripletSet:
         if not is_iterable(data):
             #it is assumed that data consists ;-separated Triplet-izable entities
             data = data.split(';')
-        data = [Triplet(x) for x in data]
-        self._items.update( dict.fromkeys(data))
+        if isinstance(data, TripletSet):
+            self._items.update(data._items)
+            return self
+        # the triplets are immutable: the existing ones are shared, not parsed again
+        self._items.update(dict.fromkeys(x if type(x) is Triplet else Triplet(x) for x in data))
         return self
 
     def add(self, value):
-        self._items[Triplet(value)]=None
+        self._items[value if type(value) is Triplet else Triplet(value)]=None
 
     def discard(self, value):
         return self._items.pop(value, None)
@@ -69,13 +94,15 @@ class TripletSet:
 
     # --- Set operations ---
     def __or__(self, other):
-        return TripletSet(self._items | other._items)
+        return TripletSet(self._items | _as_tripletset(other)._items)
 
     def __and__(self, other):
-        return TripletSet(self._items & other._items)
+        other = _as_tripletset(other)
+        return TripletSet([t for t in self._items if t in other._items])
 
     def __sub__(self, other):
-        return TripletSet(self._items - other._items)
+        other = _as_tripletset(other)
+        return TripletSet([t for t in self._items if t not in other._items])
         
     def select_fields(self, name=False, property=False, value=False) -> dict:
         result = []
@@ -121,4 +148,7 @@ class TripletSet:
         return format_dict(to_dict(self._items))
 
 def tripletset_to_sorted_list(tripletset):
-    return [ u.__repr__() for u in sorted(tripletset, key=lambda x: x.__repr__())]
\ No newline at end of file
+    return [ u.__repr__() for u in sorted(tripletset, key=lambda x: x.__repr__())]
+
+def _as_tripletset(triplets):
+    return triplets if isinstance(triplets, TripletSet) else TripletSet(triplets)